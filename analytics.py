@@ -0,0 +1,203 @@
+"""
+📈 Global analytics kept up to date as users change
+Users active in the last hour/day, message rates and stage-ups, counted in
+per-minute buckets with running window totals: UserMemory feeds every change
+in, and /status reads the totals without touching any user file.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+ACTIVE_WINDOWS = {"1h": 3600, "24h": 86400}
+RATE_WINDOWS = {"1m": 60, "5m": 300, "1h": 3600, "24h": 86400}
+
+
+class SlidingCounter:
+    """Counts per time bucket, with a running total for each trailing window"""
+
+    def __init__(self, windows: Dict[str, float], bucket: float = 60.0):
+        self.bucket = bucket
+        self.sizes = {name: max(1, int(seconds // bucket)) for name, seconds in windows.items()}
+        self.span = max(self.sizes.values())
+        self.counts: Dict[int, int] = {}
+        self.totals = {name: 0 for name in windows}
+        self.current = int(time.time() // bucket)
+        self._lock = threading.Lock()
+
+    def _advance(self, current: int):
+        """Move the windows forward, dropping buckets that fall out (lock held)"""
+        if current <= self.current:
+            return
+        for name, size in self.sizes.items():
+            for expired in range(self.current - size + 1, min(current - size + 1, self.current + 1)):
+                self.totals[name] -= self.counts.get(expired, 0)
+        for expired in range(self.current - self.span + 1, min(current - self.span + 1, self.current + 1)):
+            self.counts.pop(expired, None)
+        self.current = current
+
+    def add(self, when: float, n: int = 1):
+        bucket = int(when // self.bucket)
+        with self._lock:
+            self._advance(bucket)
+            if bucket <= self.current - self.span:
+                return  # older than every window
+            count = self.counts.get(bucket, 0) + n
+            if count:
+                self.counts[bucket] = count
+            else:
+                self.counts.pop(bucket, None)
+            for name, size in self.sizes.items():
+                if bucket > self.current - size:
+                    self.totals[name] += n
+
+    def window_totals(self, now: Optional[float] = None) -> Dict[str, int]:
+        with self._lock:
+            self._advance(int((now or time.time()) // self.bucket))
+            return dict(self.totals)
+
+    def state(self) -> Dict[str, int]:
+        with self._lock:
+            return {str(bucket): count for bucket, count in self.counts.items()}
+
+    def load_state(self, counts: Dict[str, int]):
+        for bucket, count in counts.items():
+            self.add(int(bucket) * self.bucket, count)
+
+
+class Analytics:
+    """Incremental counters behind /status (one per bot process)"""
+
+    def __init__(self, snapshot_path: str = "memory/analytics.json"):
+        self.snapshot_path = snapshot_path
+        # Each user sits in the bucket of their latest activity only
+        self.active_users = SlidingCounter(ACTIVE_WINDOWS)
+        self.messages = SlidingCounter(RATE_WINDOWS)
+        self.stage_ups = SlidingCounter(ACTIVE_WINDOWS)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def seed(self, last_active_times: Iterable[float]):
+        """Start from every known user's last activity (e.g. from the user registry)"""
+        for last_active in last_active_times:
+            self.active_users.add(last_active)
+
+    def user_active(self, previous: Optional[float], last_active: float):
+        """A user's last_active moved from previous (None for a new user)"""
+        if previous:
+            self.active_users.add(previous, -1)
+        self.active_users.add(last_active)
+
+    def user_removed(self, last_active: float):
+        """A user was deleted"""
+        if last_active:
+            self.active_users.add(last_active, -1)
+
+    def message(self, when: Optional[float] = None):
+        self.messages.add(when or time.time())
+
+    def stage_up(self, when: Optional[float] = None):
+        self.stage_ups.add(when or time.time())
+
+    def summary(self, now: Optional[float] = None) -> Dict:
+        now = now or time.time()
+        messages = self.messages.window_totals(now)
+        return {
+            "active_users": self.active_users.window_totals(now),
+            "messages": messages,
+            "messages_per_minute": {
+                name: round(count * 60 / RATE_WINDOWS[name], 2) for name, count in messages.items()
+            },
+            "stage_ups": self.stage_ups.window_totals(now),
+        }
+
+    # ====== SNAPSHOT ======
+    def state(self) -> Dict:
+        return {
+            "version": SNAPSHOT_VERSION,
+            "saved_at": time.time(),
+            "active_users": self.active_users.state(),
+            "messages": self.messages.state(),
+            "stage_ups": self.stage_ups.state(),
+        }
+
+    def load_state(self, state: Dict):
+        self.active_users.load_state(state.get("active_users", {}))
+        self.messages.load_state(state.get("messages", {}))
+        self.stage_ups.load_state(state.get("stage_ups", {}))
+
+    def save_snapshot(self):
+        """Atomically write the buckets, for a web process that is not this one"""
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(self.state(), f, separators=(",", ":"))
+        os.replace(temp, self.snapshot_path)
+
+    def start(self, interval: float = 10.0):
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="analytics", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.save_snapshot()
+
+    def _run(self, interval: float):
+        while not self._stopped.wait(interval):
+            try:
+                self.save_snapshot()
+            except OSError as e:
+                log.warning(f"⚠️ Analytics snapshot failed: {e}")
+
+
+class AnalyticsView:
+    """Read-only sum of the snapshots other processes write (sharded workers, gunicorn web)"""
+
+    def __init__(self, snapshot_paths: List[str]):
+        self.snapshot_paths = snapshot_paths
+        self._states: Dict[str, Dict] = {}
+        self._mtimes: Dict[str, int] = {}
+        self._merged = Analytics()
+        self._lock = threading.Lock()
+
+    def refresh(self) -> bool:
+        """Re-read changed snapshots; users are partitioned, so the buckets simply add up"""
+        changed = False
+        for path in self.snapshot_paths:
+            try:
+                mtime = os.stat(path).st_mtime_ns
+                if mtime == self._mtimes.get(path):
+                    continue
+                with open(path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if state.get("version") == SNAPSHOT_VERSION:
+                self._states[path], self._mtimes[path] = state, mtime
+                changed = True
+        if changed:
+            merged = Analytics()
+            for state in self._states.values():
+                merged.load_state(state)
+            with self._lock:
+                self._merged = merged
+        return bool(self._states)
+
+    def summary(self, now: Optional[float] = None) -> Dict:
+        with self._lock:
+            merged = self._merged
+        return merged.summary(now)
@@ -0,0 +1,134 @@
+"""
+📦 Record codec benchmark: bytes on disk, encode and decode time per format
+
+    python -m bench.codec --records 2000
+
+Formats: the original pretty-printed JSON, compact JSON and binary (msgpack;
+C speedups only when the msgpack package is installed). Two record shapes:
+a current record, and an old one still carrying 50 inline messages of Sinhala
+text. "stage+love" is decoding a record and reading just those two fields,
+where the binary codec leaves the history undecoded.
+
+Before timing, binary records are round-tripped between the msgpack C
+extension and the pure-Python fallback (both ways, when msgpack is
+installed), including the fixext types msgpack writes for short histories.
+"""
+import argparse
+import contextlib
+import json
+import random
+import time
+
+import codec
+
+WORDS = ["මම", "ඔයා", "ආදරෙයි", "කොහොමද", "හායි", "හොඳින්", "😘", "💕", "අද", "මොකද", "කරන්නේ", "hello", "ok"]
+
+
+def sentence(rng: random.Random, limit: int = 200) -> str:
+    words = []
+    while len(" ".join(words)) < limit:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)[:limit]
+
+
+def make_record(rng: random.Random, user_id: int, history: int) -> dict:
+    data = {
+        "user_id": user_id,
+        "stage": rng.randint(1, 5),
+        "love": rng.randint(0, 100),
+        "message_count": rng.randint(0, 5000),
+        "created": "2025-03-14T09:26:53.589793",
+        "last_active": time.time() - rng.uniform(0, 86400),
+    }
+    if history:
+        data["messages"] = [
+            {"user": sentence(rng), "bot": sentence(rng), "time": "2025-03-14T09:26:53.589793"}
+            for _ in range(history)
+        ]
+    return data
+
+
+FORMATS = {
+    "pretty json": (
+        lambda data: json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8"),
+        json.loads,
+    ),
+    "compact json": (lambda data: codec.encode(data, codec.get_codec("json")), codec.decode),
+    "binary": (lambda data: codec.encode(data, codec.get_codec("binary")), codec.decode),
+}
+
+
+@contextlib.contextmanager
+def pure_msgpack():
+    """The binary codec as it runs without the msgpack package"""
+    saved, codec.msgpack = codec.msgpack, None
+    try:
+        yield
+    finally:
+        codec.msgpack = saved
+
+
+def check_interop(records) -> int:
+    """Binary records written by one msgpack implementation must load with the other"""
+    binary = codec.get_codec("binary")
+    header = codec.MAGIC + bytes((binary.codec_id, codec.SCHEMA_VERSION))
+    checked = 0
+    # {"messages": [1, ..., size - 1]} with the history as fixext 1/2/4/8/16, e.g. d4 01 90 for []
+    for first, size in ((0xD4, 1), (0xD5, 2), (0xD6, 4), (0xD7, 8), (0xD8, 16)):
+        history = bytes((0x90 | (size - 1),)) + bytes(range(1, size))
+        raw = header + b"\x81\xa8messages" + bytes((first, codec.HISTORY_EXT)) + history
+        with pure_msgpack():
+            assert list(codec.decode(raw)["messages"]) == list(range(1, size)), f"fixext 0x{first:02x}"
+        checked += 1
+    if codec.msgpack is None:
+        return checked
+    samples = list(records) + [{**records[0], "messages": []}, {**records[0], "messages": [{"user": "හායි"}]}]
+    for data in samples:
+        expected = json.loads(json.dumps(data, default=codec.plain))
+        c_raw = codec.encode(data, binary)
+        with pure_msgpack():
+            assert json.loads(json.dumps(codec.decode(c_raw), default=codec.plain)) == expected, "C -> pure"
+            pure_raw = codec.encode(data, binary)
+        assert json.loads(json.dumps(codec.decode(pure_raw), default=codec.plain)) == expected, "pure -> C"
+        checked += 1
+    return checked
+
+
+def per_record_us(fn, items) -> float:
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - started) / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Size and speed of the user record codecs")
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    shapes = {
+        "current": [make_record(rng, 100000 + i, 0) for i in range(args.records)],
+        "50 messages": [make_record(rng, 100000 + i, 50) for i in range(max(1, args.records // 10))],
+    }
+    print(f"binary codec: {'msgpack C extension' if codec.msgpack else 'pure Python msgpack'}")
+    interop = check_interop(shapes["current"][:100] + shapes["50 messages"][:20])
+    print(f"C/pure msgpack interop: {interop} records ok" if codec.msgpack else
+          f"pure msgpack fixext decoding: {interop} records ok (install msgpack to check C/pure interop)")
+    for shape, records in shapes.items():
+        print(f"\n{shape} record ({len(records)} records)")
+        print(f"{'format':14s} {'bytes':>8s} {'encode us':>10s} {'decode us':>10s} {'stage+love us':>14s}")
+        for name, (encode, decode) in FORMATS.items():
+            encoded = [encode(data) for data in records]
+            for raw, data in zip(encoded, records):
+                assert json.loads(json.dumps(decode(raw), default=codec.plain)) == data, f"{name} round-trip"
+            size = sum(map(len, encoded)) / len(encoded)
+            encode_us = per_record_us(encode, records)
+            decode_us = per_record_us(decode, encoded)
+            fields_us = per_record_us(lambda raw: (lambda d: (d["stage"], d["love"]))(decode(raw)), encoded)
+            print(f"{name:14s} {size:8.0f} {encode_us:10.1f} {decode_us:10.1f} {fields_us:14.1f}")
+
+
+if __name__ == "__main__":
+    main()
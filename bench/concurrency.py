@@ -0,0 +1,65 @@
+"""
+⏱️ Concurrent update throughput with per-user ordering
+
+    python -m bench.concurrency [--users 200] [--messages 10] [--reply-delay 0.02]
+
+Drives main.handle_message with many simulated users whose replies are slow,
+at several concurrency levels. Checks that no love/stage update is lost and
+that each user's replies come back in the order their messages were sent.
+"""
+import argparse
+import asyncio
+import time
+
+from bench.support import dispatch, load_bot, make_update
+
+
+async def run_level(bot, users: int, messages: int, reply_delay: float, concurrency: int, base_id: int):
+    replies = {uid: [] for uid in range(base_id, base_id + users)}
+    # Interleave users the way real traffic arrives
+    updates = [
+        make_update(uid, f"hi {n}", replies[uid], reply_delay)
+        for n in range(messages)
+        for uid in replies
+    ]
+    started = time.perf_counter()
+    await dispatch(bot.handle_message, updates, concurrency)
+    elapsed = time.perf_counter() - started
+
+    lost = sum(1 for uid in replies if bot.user_memories.get(uid).data["love"] != min(100, messages))
+    unordered = sum(
+        1 for uid, got in replies.items()
+        if [t for t, _ in got] != sorted(t for t, _ in got) or len(got) != messages
+    )
+    return len(updates) / elapsed, lost, unordered
+
+
+async def run(args):
+    # Send limits are lifted so the numbers show handler concurrency only
+    bot = load_bot(
+        MEMORY_WRITE_BEHIND=1, MEMORY_FLUSH_INTERVAL=60, MEMORY_CACHE_SIZE=10 ** 6,
+        SEND_GLOBAL_RATE=10 ** 6, SEND_CHAT_RATE=10 ** 6, SEND_CHAT_BURST=10 ** 6, SEND_QUEUE_MAX=10 ** 6,
+    )
+    print(f"users: {args.users}, messages/user: {args.messages}, reply delay: {args.reply_delay * 1000:.0f} ms")
+    baseline = None
+    for n, concurrency in enumerate(args.levels):
+        rate, lost, unordered = await run_level(
+            bot, args.users, args.messages, args.reply_delay, concurrency, base_id=(n + 1) * 10 ** 6
+        )
+        baseline = baseline or rate
+        print(f"concurrency {concurrency:4d}: {rate:9.1f} msgs/s  ({rate / baseline:5.1f}x)"
+              f"  lost updates: {lost}  out-of-order users: {unordered}")
+    bot.memory_flusher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--reply-delay", type=float, default=0.02)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 64, 256])
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
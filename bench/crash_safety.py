@@ -0,0 +1,150 @@
+"""
+💥 Crash-injection check for user saves: no acknowledged save lost, no record reset
+
+    python -m bench.crash_safety --rounds 30
+    python -m bench.crash_safety --store sqlite --durability strict
+    python -m bench.crash_safety --store unsafe      # the old truncate-in-place save
+
+Each round starts a writer process that opens the store (replaying its journal
+if there is one) and keeps saving random batches of users with a bumped
+counter, printing each batch once save_many() has returned. The round ends
+with a SIGKILL at a random moment, often in the middle of a write. The next
+round reopens the store and checks that every user still loads and holds at
+least the last counter acknowledged for it.
+
+A SIGKILL keeps the page cache, so this proves atomicity and the order of
+journal, file writes and checkpoints, not what fsync adds on power loss.
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+
+from bench.support import REPO_ROOT
+from storage import CorruptRecordError, JSONFileStore, SQLiteStore
+
+
+class UnsafeJSONStore(JSONFileStore):
+    """How saves worked before: truncate the live file, then write it"""
+
+    def save_many(self, items):
+        for user_id, data in items:
+            with open(self.path_for(user_id), "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def open_test_store(kind: str, root: str, durability: str, journal_max_bytes: int):
+    if kind == "sqlite":
+        return SQLiteStore(os.path.join(root, "users.db"), durability)
+    if kind == "unsafe":
+        return UnsafeJSONStore(os.path.join(root, "users"), "strict")
+    return JSONFileStore(
+        os.path.join(root, "users"), durability, os.path.join(root, "users.journal"), journal_max_bytes
+    )
+
+
+def writer(args):
+    """Child: save forever; one stdout line per acknowledged user save"""
+    store = open_test_store(args.store, args.root, args.durability, args.journal_max_bytes)
+    rng = random.Random(os.getpid())
+    counters = {}
+    for user_id in range(1, args.users + 1):
+        data = store.load(user_id)
+        counters[user_id] = data["n"] if data else 0
+    while True:
+        batch = []
+        for user_id in rng.sample(range(1, args.users + 1), args.batch):
+            counters[user_id] += 1
+            batch.append((user_id, {
+                "user_id": user_id,
+                "stage": 1 + counters[user_id] % 5,
+                "love": counters[user_id] % 101,
+                "n": counters[user_id],
+                # Records of varying size, so some writes span several blocks
+                "notes": "සමාලි " * rng.randint(0, 400),
+            }))
+        store.save_many(batch)
+        sys.stdout.write("".join(f"{user_id} {data['n']}\n" for user_id, data in batch))
+        sys.stdout.flush()
+
+
+def verify(args, acked: Dict[int, int]) -> Dict[str, int]:
+    """Reopen (replaying any journal) and compare every user with its last acknowledged save"""
+    problems = {"lost": 0, "reset": 0, "corrupt": 0}
+    store = open_test_store(args.store, args.root, args.durability, args.journal_max_bytes)
+    try:
+        for user_id, expected in acked.items():
+            try:
+                data = store.load(user_id)
+            except CorruptRecordError:
+                problems["corrupt"] += 1
+                acked[user_id] = 0  # moved aside; starts over
+                continue
+            if data is None:
+                problems["lost"] += 1
+                acked[user_id] = 0
+            elif data["n"] < expected:
+                problems["reset"] += 1
+                acked[user_id] = data["n"]
+    finally:
+        store.close()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SIGKILL a writer mid-save and check what survived")
+    parser.add_argument("--store", choices=["json", "sqlite", "unsafe"], default="json")
+    parser.add_argument("--durability", choices=["strict", "batched"], default="batched")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=20, help="users per save_many()")
+    parser.add_argument("--journal-max-bytes", type=int, default=256 * 1024, help="small, to hit checkpoints")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return writer(args)
+
+    rng = random.Random(args.seed)
+    args.root = tempfile.mkdtemp(prefix="samali-crash-")
+    acked: Dict[int, int] = {}
+    totals = {"lost": 0, "reset": 0, "corrupt": 0}
+    saves = 0
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])))
+    for round_number in range(args.rounds + 1):
+        for key, value in verify(args, acked).items():
+            totals[key] += value
+        if round_number == args.rounds:
+            break
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "bench.crash_safety", "--child", "--root", args.root,
+             "--store", args.store, "--durability", args.durability, "--users", str(args.users),
+             "--batch", str(args.batch), "--journal-max-bytes", str(args.journal_max_bytes)],
+            cwd=REPO_ROOT, env=env, stdout=subprocess.PIPE, text=True,
+        )
+        time.sleep(rng.uniform(0.3, 1.5))
+        proc.send_signal(signal.SIGKILL)
+        output, _ = proc.communicate()
+        for line in output.splitlines():
+            parts = line.split()
+            if len(parts) == 2:  # the last line may be cut off by the kill
+                user_id, n = int(parts[0]), int(parts[1])
+                acked[user_id] = max(acked.get(user_id, 0), n)
+                saves += 1
+
+    print(f"store {args.store}  durability {args.durability}  rounds {args.rounds}  acknowledged saves {saves}")
+    print(f"lost {totals['lost']}  reset {totals['reset']}  corrupt {totals['corrupt']}")
+    if any(totals.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+🧪 Local stand-in for the Telegram Bot API
+
+    python -m bench.fake_telegram --port 8081
+    TELEGRAM_API_BASE_URL=http://127.0.0.1:8081 python main.py
+
+Implements just enough of the Bot API for the bot to run offline: getMe,
+sendMessage, setWebhook/deleteWebhook and getUpdates. Replies are recorded in
+`sent`, and updates can be fed in through getUpdates (polling) or POSTed to the
+registered webhook with its secret token. flood_next() makes sendMessage answer
+429 so RetryAfter handling can be exercised.
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+class FloodWait(Exception):
+    """Makes the fake API answer 429 with a retry_after, like Telegram"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too Many Requests: retry after {retry_after}")
+        self.retry_after = retry_after
+
+
+def make_text_update(update_id: int, user_id: int, text: str, first_name: str = "User") -> Dict:
+    """Minimal private-chat text Update as Telegram would send it"""
+    entities = []
+    if text.startswith("/"):
+        entities.append({"type": "bot_command", "offset": 0, "length": len(text.split()[0])})
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private", "first_name": first_name},
+        "from": {"id": user_id, "is_bot": False, "first_name": first_name},
+        "text": text,
+    }
+    if entities:
+        message["entities"] = entities
+    return {"update_id": update_id, "message": message}
+
+
+class FakeTelegramServer:
+    """Threaded HTTP server speaking a small subset of the Bot API"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, username: str = "samali_test_bot"):
+        self.username = username
+        self.sent: List[Dict] = []
+        self.webhook: Dict = {}
+        self.calls: Dict[str, int] = {}
+        self._updates: List[Dict] = []
+        self._floods: List[int] = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._new_update = threading.Condition(self._lock)
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-telegram", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    # ---- feeding updates ----
+
+    def next_update(self, user_id: int, text: str, first_name: str = "User") -> Dict:
+        return make_text_update(next(self._update_ids), user_id, text, first_name)
+
+    def enqueue_update(self, update: Dict):
+        """Queue an update for getUpdates (polling mode)"""
+        with self._new_update:
+            self._updates.append(update)
+            self._new_update.notify_all()
+
+    def push_webhook(self, update: Dict, secret: Optional[str] = None) -> int:
+        """POST an update to the registered webhook; returns the HTTP status"""
+        url = self.webhook.get("url")
+        if not url:
+            raise RuntimeError("no webhook registered")
+        token = self.webhook.get("secret_token", "") if secret is None else secret
+        req = urllib.request.Request(
+            url,
+            data=json.dumps(update).encode("utf-8"),
+            headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": token},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=10) as resp:
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def flood_next(self, count: int = 1, retry_after: int = 1):
+        """Answer the next `count` sendMessage calls with 429 Too Many Requests"""
+        with self._lock:
+            self._floods.extend([retry_after] * count)
+
+    # ---- Bot API methods ----
+
+    def handle(self, method: str, params: Dict):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        handler = getattr(self, f"api_{method}", None)
+        if handler is None:
+            return True
+        return handler(params)
+
+    def api_getMe(self, params):
+        return {"id": 1000001, "is_bot": True, "first_name": "Samali", "username": self.username}
+
+    def api_sendMessage(self, params):
+        with self._lock:
+            retry_after = self._floods.pop(0) if self._floods else None
+        if retry_after is not None:
+            raise FloodWait(retry_after)
+        chat_id = int(params["chat_id"])
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": params.get("text", ""),
+        }
+        with self._lock:
+            self.sent.append({"chat_id": chat_id, "text": message["text"], "time": time.time()})
+        return message
+
+    def api_setWebhook(self, params):
+        self.webhook = {"url": params.get("url", ""), "secret_token": params.get("secret_token", "")}
+        return True
+
+    def api_deleteWebhook(self, params):
+        self.webhook = {}
+        return True
+
+    def api_getWebhookInfo(self, params):
+        return {"url": self.webhook.get("url", ""), "has_custom_certificate": False, "pending_update_count": 0}
+
+    def api_getUpdates(self, params):
+        offset = int(params.get("offset") or 0)
+        timeout = min(float(params.get("timeout") or 0), 2.0)
+        deadline = time.time() + timeout
+        with self._new_update:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates and time.time() < deadline:
+                self._new_update.wait(deadline - time.time())
+            return list(self._updates)
+
+    # ---- HTTP plumbing ----
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _params(self) -> Dict:
+                parsed = urllib.parse.urlparse(self.path)
+                params = {k: v[-1] for k, v in urllib.parse.parse_qs(parsed.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                ctype = self.headers.get("Content-Type", "")
+                if body and "json" in ctype:
+                    params.update(json.loads(body))
+                elif body:
+                    params.update({k: v[-1] for k, v in urllib.parse.parse_qs(body.decode("utf-8")).items()})
+                return params
+
+            def _dispatch(self):
+                method = urllib.parse.urlparse(self.path).path.rstrip("/").rsplit("/", 1)[-1]
+                try:
+                    result = server.handle(method, self._params())
+                    status, body = 200, {"ok": True, "result": result}
+                except FloodWait as e:
+                    status, body = 429, {
+                        "ok": False,
+                        "error_code": 429,
+                        "description": str(e),
+                        "parameters": {"retry_after": e.retry_after},
+                    }
+                except Exception as e:
+                    status, body = 400, {"ok": False, "error_code": 400, "description": str(e)}
+                data = json.dumps(body).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the bot hung up (e.g. a long poll cancelled at shutdown)
+
+            do_GET = _dispatch
+            do_POST = _dispatch
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake Telegram Bot API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+
+    server = FakeTelegramServer(args.host, args.port).start()
+    print(f"🧪 Fake Telegram API on {server.base_url} (set TELEGRAM_API_BASE_URL to this)")
+    seen = 0
+    try:
+        while True:
+            time.sleep(0.5)
+            for msg in server.sent[seen:]:
+                print(f"→ {msg['chat_id']}: {msg['text'][:60]}")
+            seen = len(server.sent)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
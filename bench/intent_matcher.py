@@ -0,0 +1,131 @@
+"""
+⏱️ Intent matcher micro-benchmark
+
+    python -m bench.intent_matcher [--extra-keywords 500]
+
+Compares the old `any(word in msg for word in ...)` chain with IntentMatcher
+(and checks finditer() reports each intent where the chain would find it),
+then times the fuzzy (trigram) fallback on messages with typos, and the
+IntentCache on a repetitive (Zipf) stream of messages.
+"""
+import argparse
+import random
+import sys
+import time
+
+from intents import INTENT_KEYWORDS, INTENT_SPELLINGS, IntentCache, IntentMatcher, normalize
+
+SAMPLE_MESSAGES = [
+    "හායි", "ආදරෙයි", "මට ඔයාව මිස් වෙනවා", "ඒ කෙල්ල කවුද", "/stage", "/stats",
+    "අද මොකද කලේ", "ok", "hello samali", "❤️", "කොහොමද ඉතින්", "good night",
+    "මම අද පන්ති ගියා ඒ නිසා පරක්කු උනේ", "what is your name", "hmm",
+]
+
+# (message, intent it should still get); None: must not fuzzy-match anything
+TYPO_MESSAGES = [
+    ("helo", "greeting"), ("kohomda", "greeting"), ("i adare you", "love"), ("ආයුබො", "greeting"), ("adara", "love"),
+    ("whats your naame", "name"), ("ok", None), ("good night", None), ("hmm", None),
+    # Near misses: a shared suffix, a short word inside a longer keyword, a truncated keyword
+    ("where are you", None), ("same here", None), ("i came home", None),
+    ("what game do you play", None), ("games", None), ("fellow", None), ("yellow", None),
+    ("mellow", None), ("cello", None), ("hell", None), ("dare", None), ("madare", None), ("nam", None),
+]
+
+
+def chain_classify(intents, text):
+    """The original if/elif chain: one substring scan per keyword group"""
+    for name, keywords in intents:
+        if any(word in text for word in keywords):
+            return name
+    return None
+
+
+def chain_positions(intents, text):
+    """Intent -> first position any of its keywords occurs at, by str.find"""
+    found = {}
+    for name, keywords in intents:
+        positions = [text.find(word) for word in keywords if word in text]
+        if positions:
+            found[name] = min(positions)
+    return found
+
+
+def first(matcher, text):
+    """Highest-priority intent, as ResponseEngine takes it"""
+    intents = matcher.intents_for(text)
+    return intents[0] if intents else None
+
+
+def run(func, messages, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for msg in messages:
+            func(msg)
+    elapsed = time.perf_counter() - started
+    return elapsed / (rounds * len(messages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--extra-keywords", type=int, default=0,
+                        help="add N synthetic keywords per intent to show scaling")
+    parser.add_argument("--threshold", type=float, default=0.55, help="fuzzy similarity threshold")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    intents = [
+        (name, keywords + [f"kw{name}{rng.randrange(10**9)}" for _ in range(args.extra_keywords)])
+        for name, keywords in INTENT_KEYWORDS
+    ]
+    messages = [m.lower() for m in SAMPLE_MESSAGES]
+    matcher = IntentMatcher(intents)
+
+    mismatches = [m for m in messages if chain_classify(intents, m) != first(matcher, m)]
+    for m in messages:
+        positions = {}
+        for name, pos, _ in matcher.finditer(m):
+            positions.setdefault(name, pos)
+        if positions != chain_positions(intents, m):
+            mismatches.append(m)
+    chain_us = run(lambda m: chain_classify(intents, m), messages, args.rounds)
+    matcher_us = run(lambda m: first(matcher, m), messages, args.rounds)
+
+    keyword_count = sum(len(k) for _, k in intents)
+    print(f"keywords: {keyword_count}, messages: {len(messages)}, rounds: {args.rounds}")
+    print(f"any() chain     : {chain_us:8.2f} µs/msg")
+    print(f"IntentMatcher   : {matcher_us:8.2f} µs/msg")
+    print(f"speedup         : {chain_us / matcher_us:8.2f}x")
+    if mismatches:
+        print(f"⚠️ {len(mismatches)} messages classified differently: {mismatches}")
+
+    fuzzy = IntentMatcher(intents, fuzzy_threshold=args.threshold, spellings=INTENT_SPELLINGS)
+    typos = [normalize(m) for m, _ in TYPO_MESSAGES]
+    # Misses take the slow path: an exact scan, then the trigram lookup
+    misses = [m for m in messages if first(matcher, m) is None] + typos
+    long_message = " ".join(SAMPLE_MESSAGES * 20).lower()
+    fuzzy_us = run(lambda m: first(fuzzy, m), misses, max(1, args.rounds // 10))
+    long_us = run(fuzzy.fuzzy.best, [long_message], max(1, args.rounds // 10))
+    wrong = [(m, first(fuzzy, normalize(m)), want) for m, want in TYPO_MESSAGES if first(fuzzy, normalize(m)) != want]
+    print(f"fuzzy fallback  : {fuzzy_us:8.2f} µs/msg  (threshold {args.threshold}, {len(misses)} non-matching messages)")
+    print(f"trigram lookup  : {long_us:8.2f} µs/msg  ({len(long_message.split())}-word message)")
+    if wrong:
+        print(f"⚠️ typo messages classified unexpectedly: {wrong}")
+
+    # A few phrases make up most traffic, with a long tail of one-off messages
+    vocabulary = SAMPLE_MESSAGES + [m for m, _ in TYPO_MESSAGES] + [
+        f"{rng.choice(SAMPLE_MESSAGES)} {rng.randrange(10**6)}" for _ in range(2000)
+    ]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    stream = [normalize(m) for m in rng.choices(vocabulary, weights, k=20000)]
+    cache = IntentCache()
+    uncached_us = run(fuzzy.intents_for, stream, 1)
+    cached_us = run(lambda m: cache.get(m, 0, fuzzy.match), stream, 1)
+    print(f"intents_for     : {uncached_us:8.2f} µs/msg  (Zipf stream of {len(stream)} messages)")
+    print(f"with IntentCache: {cached_us:8.2f} µs/msg  (hit rate {cache.stats()['hit_rate']:.0%})")
+    if wrong:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
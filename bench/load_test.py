@@ -0,0 +1,259 @@
+"""
+🏋️ Offline load test for handle_message
+
+    python -m bench.load_test                       # every scenario, compared with baselines
+    python -m bench.load_test --scenario zipf --users 2000 --messages 20000
+    python -m bench.load_test --save-baseline       # record current numbers as the baseline
+
+Each scenario runs in its own subprocess (clean cache and honest peak RSS)
+against a scratch memory/ directory. Real telegram.Update objects are fed
+through main.handle_message with a stub bot that records replies.
+
+Reports msgs/s, p50/p95/p99 handler latency, bytes written to memory/ and
+peak RSS. Baselines live in bench/baselines/<scenario>-<backend>.json; a run that is
+more than --tolerance worse than its baseline is flagged as a regression. The
+committed baselines were recorded with the default sizes on a single-CPU box;
+re-record them on your own machine (--save-baseline) before trusting the check.
+A scenario with no baseline, or one recorded with other sizes, is skipped.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from bench.support import REPO_ROOT, StubBot, load_bot, telegram_update
+
+BASELINE_DIR = os.path.join(REPO_ROOT, "bench", "baselines")
+
+SCENARIOS = {
+    "uniform": "N users x M messages each, every user equally active",
+    "zipf": "M messages total, user activity Zipf-distributed (a few heavy users)",
+    "cold": "users already on disk, empty cache: every first message loads from storage",
+    "warm": "same users as cold, cache already populated",
+    "slow-disk": "zipf traffic with every store load/save delayed by --disk-delay",
+}
+
+MESSAGES = [
+    "හායි", "ආදරෙයි", "මට ඔයාව මිස් වෙනවා", "ඒ කෙල්ල කවුද", "/stage", "/stats",
+    "අද මොකද කලේ", "ok", "hello", "❤️", "කොහොමද", "good night", "hmm", "ඔයාගේ නම මොකක්ද",
+]
+
+
+class SlowStore:
+    """Wraps a MemoryStore and sleeps before every call, like a slow disk"""
+
+    def __init__(self, store, delay: float):
+        self._store = store
+        self._delay = delay
+
+    def __getattr__(self, name):
+        attr = getattr(self._store, name)
+        if name not in ("load", "save", "save_many", "delete"):
+            return attr
+
+        def slowed(*args, **kwargs):
+            time.sleep(self._delay)
+            return attr(*args, **kwargs)
+
+        return slowed
+
+
+def zipf_users(rng: random.Random, users: int, count: int, s: float = 1.1) -> List[int]:
+    weights = [1 / (rank ** s) for rank in range(1, users + 1)]
+    return rng.choices(range(1, users + 1), weights=weights, k=count)
+
+
+def bytes_written() -> int:
+    """Bytes handed to write() by this process (Linux), else 0"""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def drive(bot, updates, concurrency: int) -> List[float]:
+    """Feed updates like Application(concurrent_updates=N) and time each one"""
+    latencies: List[float] = []
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(update):
+        async with slots:
+            started = time.perf_counter()
+            await bot.handle_message(update, None)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(asyncio.create_task(run(u)) for u in updates))
+    return latencies
+
+
+async def run_scenario(args) -> Dict:
+    env = dict(
+        MEMORY_BACKEND=args.backend,
+        SEND_GLOBAL_RATE=10 ** 6, SEND_CHAT_RATE=10 ** 6, SEND_CHAT_BURST=10 ** 6, SEND_QUEUE_MAX=10 ** 6,
+    )
+    bot = load_bot(**env)
+    stub = StubBot(args.reply_delay)
+    rng = random.Random(args.seed)
+    update_ids = iter(range(1, 10 ** 9))
+
+    def updates_for(user_ids):
+        return [telegram_update(stub, next(update_ids), uid, rng.choice(MESSAGES)) for uid in user_ids]
+
+    scenario = args.scenario
+    if scenario in ("cold", "warm", "slow-disk"):
+        # Put every user on disk first, then drop the cache
+        await drive(bot, updates_for(range(1, args.users + 1)), args.concurrency)
+        bot.user_memories.clear()
+        if bot.memory_flusher is not None:
+            bot.memory_flusher.flush()
+        await bot.storage_io.drain()
+    if scenario == "slow-disk":
+        slow = SlowStore(bot.memory_store, args.disk_delay)
+        bot.memory_store = bot.storage_io.store = slow
+        if bot.memory_flusher is not None:
+            bot.memory_flusher.store = slow
+
+    if scenario == "uniform":
+        user_ids = [uid for _ in range(max(1, args.messages // args.users)) for uid in range(1, args.users + 1)]
+    elif scenario == "warm":
+        await drive(bot, updates_for(range(1, args.users + 1)), args.concurrency)
+        user_ids = zipf_users(rng, args.users, args.messages)
+    elif scenario == "cold":
+        user_ids = list(range(1, args.users + 1))
+        rng.shuffle(user_ids)
+    else:
+        user_ids = zipf_users(rng, args.users, args.messages)
+    updates = updates_for(user_ids)
+
+    written_before = bytes_written()
+    started = time.perf_counter()
+    latencies = await drive(bot, updates, args.concurrency)
+    elapsed = time.perf_counter() - started
+    # Count the deferred writes this traffic caused too
+    if bot.memory_flusher is not None:
+        bot.memory_flusher.stop()
+    await bot.storage_io.drain()
+    written = bytes_written() - written_before
+
+    return {
+        "scenario": scenario,
+        "backend": args.backend,
+        "users": args.users,
+        "messages": len(updates),
+        "concurrency": args.concurrency,
+        "msgs_per_s": round(len(updates) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "bytes_written": written,
+        "memory_dir_bytes": dir_size("memory"),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "replies": len(stub.sent),
+    }
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Which metrics got worse than baseline by more than tolerance"""
+    worse = []
+    checks = [("msgs_per_s", -1), ("p95_ms", 1), ("p99_ms", 1), ("bytes_written", 1), ("peak_rss_kb", 1)]
+    for key, direction in checks:
+        old, new = baseline.get(key), result.get(key)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if change * direction > tolerance:
+            worse.append(f"{key} {old} → {new} ({change:+.0%})")
+    return worse
+
+
+def child_args(args, scenario: str) -> List[str]:
+    argv = [sys.executable, "-m", "bench.load_test", "--child", "--scenario", scenario]
+    for name in ("users", "messages", "concurrency", "backend", "reply_delay", "disk_delay", "seed"):
+        argv += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    return argv
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--backend", default="json", choices=["json", "sqlite"])
+    parser.add_argument("--reply-delay", type=float, default=0.0, help="seconds per stub send")
+    parser.add_argument("--disk-delay", type=float, default=0.005, help="seconds per store call (slow-disk)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.scenario = args.scenario[0]
+        print(json.dumps(asyncio.run(run_scenario(args))))
+        return
+
+    regressions = 0
+    for scenario in args.scenario or list(SCENARIOS):
+        proc = subprocess.run(child_args(args, scenario), cwd=REPO_ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"❌ {scenario} failed:\n{proc.stderr[-2000:]}")
+            regressions += 1
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(
+            f"{scenario:10s} {result['msgs_per_s']:9.1f} msgs/s  "
+            f"p50 {result['p50_ms']:7.2f} ms  p95 {result['p95_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms  "
+            f"written {result['bytes_written'] / 1024:8.1f} KiB  rss {result['peak_rss_kb'] / 1024:6.1f} MiB"
+        )
+        path = os.path.join(BASELINE_DIR, f"{scenario}-{args.backend}.json")
+        if args.save_baseline:
+            os.makedirs(BASELINE_DIR, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+        elif not os.path.exists(path):
+            print(f"   ℹ️ no baseline at {os.path.relpath(path, REPO_ROOT)}; record one with --save-baseline")
+        else:
+            with open(path, encoding="utf-8") as f:
+                baseline = json.load(f)
+            differ = [key for key in ("users", "messages", "concurrency") if baseline.get(key) != result.get(key)]
+            if differ:
+                print(f"   ℹ️ baseline was recorded with other {', '.join(differ)}; not compared")
+                continue
+            worse = compare(result, baseline, args.tolerance)
+            if worse:
+                regressions += 1
+                print(f"   ⚠️ regression vs baseline: {'; '.join(worse)}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
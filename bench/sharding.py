@@ -0,0 +1,146 @@
+"""
+🧩 Sharded mode benchmark: replies/s, lost replies and per-user ordering
+
+    python -m bench.sharding --workers 1 2 4 --updates 2000 --users 200
+    python -m bench.sharding --workers 4 --kill-worker
+
+Runs main.py in a scratch directory against the fake Telegram API with all
+updates already waiting, once per worker count (BOT_WORKERS=1 is the plain
+single-process bot). Every user's messages are numbered, so after shutdown the
+message logs show whether any user saw them out of order. --kill-worker
+SIGKILLs one worker a third of the way through to exercise the restart; the
+update it was handling at that moment may be lost.
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.fake_telegram import FakeTelegramServer
+from bench.startup import free_port
+from bench.support import REPO_ROOT
+
+
+def children(pid: int):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def check_order(workdir: str) -> int:
+    """Users whose logged messages are not in the order they were sent"""
+    out_of_order = 0
+    for path in glob.glob(os.path.join(workdir, "memory", "logs", "*.jsonl")):
+        with open(path, encoding="utf-8") as f:
+            seqs = [int(json.loads(line)["user"][1:]) for line in f if line.strip()]
+        if seqs != sorted(seqs):
+            out_of_order += 1
+    return out_of_order
+
+
+def run(api: FakeTelegramServer, workers: int, updates: int, users: int, timeout: float, kill: bool) -> dict:
+    workdir = tempfile.mkdtemp(prefix="samali-sharding-")
+    shutil.copytree(os.path.join(REPO_ROOT, "config"), os.path.join(workdir, "config"))
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])),
+        TELEGRAM_BOT_TOKEN="123456:sharding-bench",
+        TELEGRAM_API_BASE_URL=api.base_url,
+        PORT=str(free_port()),
+        HOST="127.0.0.1",
+        LOG_LEVEL=os.environ.get("BENCH_LOG_LEVEL", "WARNING"),
+        BOT_WORKERS=str(workers),
+        # Measure the bot, not Telegram's limits
+        SEND_GLOBAL_RATE="100000",
+        SEND_CHAT_RATE="100000",
+        SEND_CHAT_BURST="100000",
+    )
+    sent_before = len(api.sent)
+    for seq in range(updates):
+        api.enqueue_update(api.next_update(1000 + seq % users, f"m{seq}"))
+
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_ROOT, "main.py")],
+        cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    started = time.perf_counter()
+    first = last = None
+    killed = None
+    try:
+        while time.perf_counter() - started < timeout and proc.poll() is None:
+            replies = len(api.sent) - sent_before
+            now = time.perf_counter()
+            if replies and first is None:
+                first = now
+            if replies >= updates:
+                last = now
+                break
+            if kill and killed is None and replies >= updates // 3:
+                pids = children(proc.pid)
+                workers_pids = pids[-workers:] if workers > 1 else []
+                if workers_pids:
+                    killed = workers_pids[0]
+                    os.kill(killed, signal.SIGKILL)
+            time.sleep(0.002)
+        if last is None and first is not None:
+            # Lost replies never arrive: settle, then count
+            time.sleep(2)
+            last = time.perf_counter()
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            output, _ = proc.communicate(timeout=60)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            output, _ = proc.communicate()
+    replies = len(api.sent) - sent_before
+    result = {
+        "workers": workers,
+        "replies": replies,
+        "lost": updates - replies,
+        "replies_per_s": (replies - 1) / (last - first) if first and last and last > first else 0.0,
+        "out_of_order_users": check_order(workdir),
+        "killed_pid": killed,
+        "exit_code": proc.returncode,
+        "output": output,
+    }
+    shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and ordering of BOT_WORKERS sharding")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--kill-worker", action="store_true", help="SIGKILL one worker mid-run")
+    args = parser.parse_args()
+
+    print(f"cpus: {os.cpu_count()}  updates: {args.updates}  users: {args.users}")
+    api = FakeTelegramServer()
+    api.start()
+    try:
+        for workers in args.workers:
+            result = run(api, workers, args.updates, args.users, args.timeout, args.kill_worker)
+            print(
+                f"workers {result['workers']:2d}  {result['replies_per_s']:8.1f} replies/s  "
+                f"lost {result['lost']:4d}  out-of-order users {result['out_of_order_users']}  "
+                f"exit {result['exit_code']}" + (f"  killed {result['killed_pid']}" if result["killed_pid"] else "")
+            )
+            if result["exit_code"] != 0 or (result["lost"] and not result["killed_pid"]):
+                print(result["output"])
+    finally:
+        api.stop()
+
+
+if __name__ == "__main__":
+    main()
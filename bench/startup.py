@@ -0,0 +1,114 @@
+"""
+⏱️ Restart benchmark: how long until the web server answers and the first reply goes out
+
+    python -m bench.startup --runs 5
+
+Starts main.py in a scratch directory against the fake Telegram API with one
+update already waiting, and times (from process spawn) the first /ping
+answer and the first sendMessage. Set --profile to print the bot's own
+STARTUP_PROFILE breakdown of the last run.
+"""
+import argparse
+import os
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from bench.fake_telegram import FakeTelegramServer
+from bench.support import REPO_ROOT
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def ping(port: int) -> bool:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/ping", timeout=0.2) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def run_once(api: FakeTelegramServer, timeout: float, profile: bool) -> dict:
+    workdir = tempfile.mkdtemp(prefix="samali-startup-")
+    shutil.copytree(os.path.join(REPO_ROOT, "config"), os.path.join(workdir, "config"))
+    port = free_port()
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])),
+        TELEGRAM_BOT_TOKEN="123456:startup-bench",
+        TELEGRAM_API_BASE_URL=api.base_url,
+        PORT=str(port),
+        HOST="127.0.0.1",
+        LOG_LEVEL="INFO" if profile else "WARNING",
+        STARTUP_PROFILE="1" if profile else "0",
+    )
+    sent_before = len(api.sent)
+    api.enqueue_update(api.next_update(1, "හායි"))
+
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_ROOT, "main.py")],
+        cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    web_ready = first_reply = None
+    try:
+        while time.perf_counter() - started < timeout and proc.poll() is None:
+            if web_ready is None and ping(port):
+                web_ready = time.perf_counter() - started
+            if first_reply is None and len(api.sent) > sent_before:
+                first_reply = time.perf_counter() - started
+            if web_ready is not None and first_reply is not None:
+                break
+            time.sleep(0.005)
+    finally:
+        stopping = time.perf_counter()
+        proc.send_signal(signal.SIGTERM)
+        try:
+            output, _ = proc.communicate(timeout=15)
+            stopped = time.perf_counter() - stopping
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            output, _ = proc.communicate()
+            stopped = None
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {"web_ready": web_ready, "first_reply": first_reply, "shutdown": stopped, "output": output}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time from spawn to first /ping and first reply")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--profile", action="store_true", help="print the STARTUP_PROFILE report of the last run")
+    args = parser.parse_args()
+
+    api = FakeTelegramServer()
+    api.start()
+    results = []
+    try:
+        for _ in range(args.runs):
+            results.append(run_once(api, args.timeout, args.profile))
+    finally:
+        api.stop()
+
+    for key in ("web_ready", "first_reply", "shutdown"):
+        values = [r[key] for r in results if r[key] is not None]
+        if len(values) < len(results):
+            print(f"{key:12s} missing in {len(results) - len(values)} run(s)")
+        if values:
+            print(f"{key:12s} median {statistics.median(values) * 1000:8.1f} ms   min {min(values) * 1000:8.1f} ms")
+    if args.profile or any(r["first_reply"] is None for r in results):
+        print(results[-1]["output"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Shared helpers for benchmarks that drive main.handle_message offline.
+"""
+import asyncio
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_bot(workdir: Optional[str] = None, **env):
+    """Import main inside a scratch directory so benchmarks never touch memory/"""
+    workdir = workdir or tempfile.mkdtemp(prefix="samali-bench-")
+    os.makedirs(os.path.join(workdir, "config"), exist_ok=True)
+    shutil.copy(os.path.join(REPO_ROOT, "config", "bot.json"), os.path.join(workdir, "config", "bot.json"))
+    os.chdir(workdir)
+    # Per-message log lines would swamp the numbers
+    env.setdefault("LOG_LEVEL", "WARNING")
+    for key, value in env.items():
+        os.environ[key] = str(value)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    sys.modules.pop("main", None)
+    return importlib.import_module("main")
+
+
+class StubMessage:
+    """Stands in for telegram.Message: records replies, optionally slowly"""
+
+    def __init__(self, text: str, replies: List, reply_delay: float = 0.0):
+        self.text = text
+        self._replies = replies
+        self._reply_delay = reply_delay
+
+    async def reply_text(self, text, **kwargs):
+        if self._reply_delay:
+            await asyncio.sleep(self._reply_delay)
+        self._replies.append((time.perf_counter(), text))
+
+
+def make_update(user_id: int, text: str, replies: List, reply_delay: float = 0.0):
+    user = SimpleNamespace(id=user_id, first_name=f"User{user_id}")
+    return SimpleNamespace(
+        update_id=0,
+        effective_user=user,
+        effective_chat=SimpleNamespace(id=user_id, type="private"),
+        message=StubMessage(text, replies, reply_delay),
+    )
+
+
+async def dispatch(handler, updates, concurrency: int):
+    """Run updates the way Application does: in order, at most N at a time"""
+    if concurrency <= 1:
+        for update in updates:
+            await handler(update, None)
+        return
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run(update):
+        async with slots:
+            await handler(update, None)
+
+    await asyncio.gather(*(asyncio.create_task(run(update)) for update in updates))
+
+
+class StubBot:
+    """Takes the place of telegram.Bot: records send_message calls"""
+
+    defaults = None
+
+    def __init__(self, reply_delay: float = 0.0):
+        self.reply_delay = reply_delay
+        self.sent: List = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.reply_delay:
+            await asyncio.sleep(self.reply_delay)
+        self.sent.append((time.perf_counter(), chat_id, text))
+
+
+def telegram_update(bot, update_id: int, user_id: int, text: str):
+    """A real telegram.Update (as parsed from the Bot API) bound to bot"""
+    from telegram import Update
+
+    from bench.fake_telegram import make_text_update
+
+    return Update.de_json(make_text_update(update_id, user_id, text, f"User{user_id}"), bot)
@@ -0,0 +1,127 @@
+"""
+🧊 Cold tier benchmark: disk and inodes saved, cost of loading a cold user
+
+    python -m bench.tiering --users 5000
+
+Builds a scratch memory/ with warm users (record + a full message log), then
+archives every user into the cold tier and reports disk usage and file
+count before and after, plus load latency for a warm user and for a cold one
+(which includes moving it back to warm). Also rebuilds the user registry
+from the tiered store, as after an unclean shutdown, and checks that the scan
+leaves every cold user cold.
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from message_log import MessageLog
+from storage import JSONFileStore, SQLiteStore
+from tiering import ColdArchive, TieredStore
+from user_registry import open_registry
+
+WORDS = ["මම", "ඔයා", "ආදරෙයි", "කොහොමද", "හායි", "හොඳින්", "😘", "💕", "අද", "මොකද", "කරන්නේ", "hello", "ok"]
+
+
+def disk_usage(root: str):
+    """(bytes on disk, files) under root"""
+    used = files = 0
+    for directory, _, names in os.walk(root):
+        for name in names:
+            used += os.stat(os.path.join(directory, name)).st_blocks * 512
+            files += 1
+    return used, files
+
+
+def sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 12)))
+
+
+def populate(store, message_log: MessageLog, users: int, history: int, seed: int):
+    rng = random.Random(seed)
+    now = time.time()
+    for user_id in range(1, users + 1):
+        store.save(user_id, {
+            "user_id": user_id,
+            "stage": rng.randint(1, 5),
+            "love": rng.randint(0, 100),
+            "message_count": history,
+            "created": "2025-01-01T00:00:00",
+            "last_active": now - rng.uniform(30, 365) * 86400,
+        })
+        message_log.append_many(user_id, [
+            {"user": sentence(rng), "bot": sentence(rng), "time": "2025-01-01T00:00:00"} for _ in range(history)
+        ])
+
+
+def percentile_ms(samples, q: float) -> float:
+    return statistics.quantiles(samples, n=100)[q - 1] * 1000 if len(samples) > 1 else samples[0] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Disk/inode savings and load latency of the cold tier")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--history", type=int, default=50, help="logged messages per user")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="samali-tiering-")
+    try:
+        memory = os.path.join(root, "memory")
+        warm = JSONFileStore(os.path.join(memory, "users")) if args.backend == "json" \
+            else SQLiteStore(os.path.join(memory, "users.db"))
+        message_log = MessageLog(os.path.join(memory, "logs"), args.history)
+        store = TieredStore(warm, ColdArchive(os.path.join(memory, "cold.db")), message_log)
+        populate(warm, message_log, args.users, args.history, args.seed)
+
+        before = disk_usage(memory)
+        sample = random.Random(args.seed).sample(range(1, args.users + 1), min(args.samples, args.users))
+        warm_loads = []
+        for user_id in sample:
+            started = time.perf_counter()
+            store.load(user_id)
+            message_log.tail(user_id)
+            warm_loads.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for user_id in range(1, args.users + 1):
+            store.archive(user_id)
+        archive_seconds = time.perf_counter() - started
+        after = disk_usage(memory)
+
+        # No snapshot: the registry is rebuilt by scanning every user
+        cold_before = store.cold.count()
+        started = time.perf_counter()
+        registry = open_registry(store, os.path.join(memory, "registry.json"))
+        rebuild_seconds = time.perf_counter() - started
+        cold_after = store.cold.count()
+        assert cold_after == cold_before, f"registry rebuild rehydrated {cold_before - cold_after} cold users"
+        assert registry.count() == args.users
+
+        cold_loads = []
+        for user_id in sample:
+            started = time.perf_counter()
+            store.load(user_id)
+            message_log.tail(user_id)
+            cold_loads.append(time.perf_counter() - started)
+        store.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print(f"users {args.users}  history {args.history}  backend {args.backend}")
+    print(f"warm   {before[0] / 1024:10.0f} KiB on disk  {before[1]:7d} files")
+    print(f"cold   {after[0] / 1024:10.0f} KiB on disk  {after[1]:7d} files   "
+          f"({after[0] / before[0]:.0%} of the bytes, archived at {args.users / archive_seconds:.0f} users/s)")
+    print(f"load   warm p50 {percentile_ms(warm_loads, 50):.3f} ms  p99 {percentile_ms(warm_loads, 99):.3f} ms   "
+          f"cold p50 {percentile_ms(cold_loads, 50):.3f} ms  p99 {percentile_ms(cold_loads, 99):.3f} ms")
+    print(f"rebuild registry {registry.count()} users in {rebuild_seconds:.2f} s   "
+          f"cold users before {cold_before}, after {cold_after}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+🗜️ Bytes per cached user: plain dict record vs the compact UserRecord
+
+    python -m bench.user_memory --users 20000
+
+Builds the same users twice from their stored JSON, as main.get_user_memory
+does: once in the old shape (a UserMemory with a __dict__, a dict record and
+a deque of pending messages) and once as the current main.UserMemory. Reports
+traced heap bytes per user for each, with nothing pending (the state after a
+flush). The cache's own OrderedDict slot is the same for both and not counted.
+"""
+import argparse
+import datetime
+import gc
+import json
+import random
+import time
+import tracemalloc
+from collections import deque
+
+from bench.support import load_bot
+
+
+class DictMemory:
+    """UserMemory as it was: instance __dict__, dict record, deque"""
+
+    def __init__(self, user_id, data):
+        self.user_id = user_id
+        self.dirty = False
+        self.pending_messages = deque()
+        self.data = data
+
+
+def records(users: int, seed: int):
+    rng = random.Random(seed)
+    now = time.time()
+    for user_id in range(1, users + 1):
+        created = datetime.datetime.now() - datetime.timedelta(seconds=rng.uniform(0, 365 * 86400))
+        yield user_id, json.dumps({
+            "user_id": user_id,
+            "stage": rng.randint(1, 5),
+            "love": rng.randint(0, 100),
+            "message_count": rng.randint(0, 5000),
+            "created": created.isoformat(),
+            "last_active": now - rng.uniform(0, 86400),
+        })
+
+
+def measure(build, stored) -> float:
+    """Heap bytes per user held by build(user_id, data) results"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(user_id, json.loads(text)) for user_id, text in stored]
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    # The list holding them is not part of a user
+    return (used - len(kept) * 8) / len(kept)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Heap bytes per cached user, old and compact record")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    bot = load_bot()
+    stored = list(records(args.users, args.seed))
+    old = measure(DictMemory, stored)
+    new = measure(bot.UserMemory.from_data, stored)
+    sample = bot.UserMemory.from_data(1, json.loads(stored[0][1]))
+    assert sample.to_dict() == json.loads(stored[0][1]), "record did not round-trip"
+
+    print(f"users {args.users}")
+    print(f"dict record     {old:7.0f} bytes/user")
+    print(f"compact record  {new:7.0f} bytes/user   ({new / old:.0%}, {old - new:.0f} bytes saved per user)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+🪝 Webhook mode check: secret-token validation, throughput and the shutdown flush
+
+    python -m bench.webhook --updates 500 --users 50
+
+Runs main.py with BOT_MODE=webhook in a scratch directory against the fake
+Telegram API, waits for setWebhook, then POSTs updates the way Telegram would:
+first with a wrong secret, an empty secret and a body that is not an update (each
+must be refused without a reply), then every update with the registered
+secret from several threads at once. After the replies arrive the bot is
+stopped with SIGTERM and every user's record must be on disk with all of
+their messages counted, and no journal left to replay.
+"""
+import argparse
+import glob
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import codec
+from bench.fake_telegram import FakeTelegramServer
+from bench.startup import free_port
+from bench.support import REPO_ROOT
+
+SECRET = "webhook-bench-secret"
+
+
+def wait_for(condition, timeout: float, proc: subprocess.Popen) -> bool:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline and proc.poll() is None:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def check_rejected(api: FakeTelegramServer) -> list:
+    """(case, status) for every bad POST that was not refused"""
+    cases = [
+        ("wrong secret", api.next_update(1, "hi"), "not-the-secret", 403),
+        ("empty secret", api.next_update(1, "hi"), "", 403),
+        ("not an update", [1, 2, 3], SECRET, 400),
+    ]
+    return [(name, status) for name, update, secret, expected in cases
+            if (status := api.push_webhook(update, secret)) != expected]
+
+
+def check_stored(workdir: str, expected: dict) -> list:
+    """Users whose record is missing or does not count every message they sent"""
+    problems = []
+    for user_id, messages in expected.items():
+        path = os.path.join(workdir, "memory", "users", f"{user_id}.json")
+        try:
+            with open(path, "rb") as f:
+                data = codec.decode(f.read())
+        except (OSError, ValueError) as e:
+            problems.append((user_id, str(e)))
+            continue
+        if data.get("message_count") != messages:
+            problems.append((user_id, f"message_count {data.get('message_count')}, sent {messages}"))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Webhook ingestion: secret check, throughput, shutdown flush")
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent POSTs, like Telegram's connections")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    api = FakeTelegramServer().start()
+    workdir = tempfile.mkdtemp(prefix="samali-webhook-")
+    shutil.copytree(os.path.join(REPO_ROOT, "config"), os.path.join(workdir, "config"))
+    port = free_port()
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])),
+        TELEGRAM_BOT_TOKEN="123456:webhook-bench",
+        TELEGRAM_API_BASE_URL=api.base_url,
+        BOT_MODE="webhook",
+        WEBHOOK_URL=f"http://127.0.0.1:{port}",
+        WEBHOOK_SECRET=SECRET,
+        PORT=str(port),
+        HOST="127.0.0.1",
+        LOG_LEVEL=os.environ.get("BENCH_LOG_LEVEL", "WARNING"),
+        # Measure the bot, not Telegram's limits
+        SEND_GLOBAL_RATE="100000",
+        SEND_CHAT_RATE="100000",
+        SEND_CHAT_BURST="100000",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_ROOT, "main.py")],
+        cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    failures = []
+    expected = {}
+    accepted = elapsed = 0.0
+    try:
+        if not wait_for(lambda: api.webhook.get("url"), args.timeout, proc):
+            raise TimeoutError("the bot never called setWebhook")
+        if api.webhook.get("secret_token") != SECRET:
+            failures.append("setWebhook was not given WEBHOOK_SECRET")
+        failures += [f"{name}: HTTP {status}" for name, status in check_rejected(api)]
+        time.sleep(0.5)
+        if api.sent:
+            failures.append(f"{len(api.sent)} replies to refused updates")
+
+        updates = []
+        for seq in range(args.updates):
+            user_id = 1000 + seq % args.users
+            updates.append(api.next_update(user_id, f"m{seq}"))
+            expected[user_id] = expected.get(user_id, 0) + 1
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            statuses = list(pool.map(lambda update: api.push_webhook(update, SECRET), updates))
+        accepted = statuses.count(200)
+        if accepted != len(updates):
+            failures.append(f"{len(updates) - accepted} good updates not accepted")
+        wait_for(lambda: len(api.sent) >= accepted, args.timeout, proc)
+        elapsed = time.perf_counter() - started
+        if len(api.sent) != accepted:
+            failures.append(f"{accepted - len(api.sent)} accepted updates got no reply")
+    except TimeoutError as e:
+        failures.append(str(e))
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            output, _ = proc.communicate(timeout=60)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            output, _ = proc.communicate()
+        api.stop()
+
+    if proc.returncode != 0:
+        failures.append(f"exit code {proc.returncode}")
+    failures += [f"user {user_id}: {problem}" for user_id, problem in check_stored(workdir, expected)]
+    if glob.glob(os.path.join(workdir, "memory", "*.journal*")):
+        failures.append("journal left behind after a clean shutdown")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"updates {args.updates}  users {args.users}  threads {args.threads}")
+    if elapsed:
+        print(f"webhook  {accepted / elapsed:8.1f} updates/s (POSTed to replied)  replies {len(api.sent)}")
+    for failure in failures:
+        print(f"⚠️ {failure}")
+    if failures:
+        print(output)
+        sys.exit(1)
+    print("refused bad secrets and bodies; every update answered and stored after shutdown")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+📝 Non-blocking structured logging
+Handlers only put records on an in-process queue; a QueueListener thread does
+the formatting and the (possibly slow) writes to stdout. Per-level sampling
+drops records before they are even built, and message bodies are redacted by
+default.
+"""
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict
+
+# Fields holding user/bot text; shown as "<N chars>" unless LOG_MESSAGE_BODIES=1
+BODY_FIELDS = ("text", "reply")
+
+_sample_rates: Dict[int, float] = {}
+_redact_bodies = True
+dropped_records = 0
+
+
+class _InProcessQueueHandler(QueueHandler):
+    """Enqueue the record untouched (no formatting on the caller's thread)"""
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        global dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records += 1
+
+
+class StructuredFormatter(logging.Formatter):
+    """Renders the `fields` extra as JSON lines or `key=value` text"""
+
+    def __init__(self, fmt: str = "text"):
+        super().__init__()
+        self.json = fmt == "json"
+
+    def format(self, record):
+        fields = dict(getattr(record, "fields", None) or {})
+        if _redact_bodies:
+            for key in BODY_FIELDS:
+                if isinstance(fields.get(key), str):
+                    fields[key] = f"<{len(fields[key])} chars>"
+        message = record.getMessage()
+        if self.json:
+            entry = {
+                "ts": round(record.created, 3),
+                "level": record.levelname,
+                "logger": record.name,
+                "event": message,
+                **fields,
+            }
+            if record.exc_info:
+                entry["exc"] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+        line = message
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def setup_logging(
+    level: str = "INFO",
+    fmt: str = "text",
+    sample: str = "",
+    redact_bodies: bool = True,
+    max_queue: int = 10000,
+    stream=None,
+) -> QueueListener:
+    """Route all logging through a bounded queue to a background writer thread
+
+    sample is "LEVEL=rate,..." e.g. "DEBUG=0.01,INFO=0.1" (default: keep all).
+    """
+    global _redact_bodies
+    _redact_bodies = redact_bodies
+    _sample_rates.clear()
+    for part in filter(None, (p.strip() for p in sample.split(","))):
+        name, _, rate = part.partition("=")
+        _sample_rates[logging.getLevelName(name.strip().upper())] = float(rate)
+
+    records = queue.Queue(maxsize=max_queue)
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(StructuredFormatter(fmt))
+    listener = QueueListener(records, output, respect_handler_level=False)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_InProcessQueueHandler(records))
+    root.setLevel(level.upper())
+    # httpx logs every Bot API call and poll at INFO, with the bot token in the URL
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    listener.start()
+    return listener
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields):
+    """Structured record, sampled per level before anything is allocated"""
+    if not logger.isEnabledFor(level):
+        return
+    rate = _sample_rates.get(level)
+    if rate is not None and random.random() >= rate:
+        return
+    logger.log(level, event, extra={"fields": fields})
+
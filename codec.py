@@ -0,0 +1,313 @@
+"""
+📦 Versioned codecs for stored user records
+JSON records stay plain JSON objects (readable by anything that reads the
+original files), compact and carrying their schema version as "_v". Binary
+records are a 5-byte header (magic, codec id, schema version) followed by
+msgpack whose message history is kept as an opaque blob and only decoded when
+something reads it. Records without "_v" or a header are the original
+pretty-printed JSON and still load as-is. MEMORY_CODEC picks the codec for new
+writes; any codec reads every format.
+"""
+import json
+import struct
+from collections.abc import Sequence
+from typing import Dict, List, Optional, Union
+
+try:
+    import msgpack  # optional: pip install msgpack (C speedups for the binary codec)
+except ImportError:
+    msgpack = None
+
+# 0xff never starts UTF-8 text, so JSON records can't be mistaken for it
+MAGIC = b"\xffSM"
+SCHEMA_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 2
+# msgpack ext type carrying an encoded message history
+HISTORY_EXT = 1
+# Schema version key inside a JSON record
+VERSION_KEY = "_v"
+
+
+class FormatVersionError(Exception):
+    """Written by a newer version of the bot (not corruption: the record is left alone)
+
+    Loading that user fails; scans over every user (registry rebuild, tiering,
+    migration) skip the record instead.
+    """
+
+
+def plain(obj):
+    """json.dumps default= for records that may hold a not yet decoded history"""
+    if isinstance(obj, LazyMessages):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class LazyMessages(Sequence):
+    """A record's message history, decoded on first access"""
+
+    __slots__ = ("raw", "_items")
+
+    def __init__(self, raw: bytes):
+        self.raw = raw
+        self._items = None
+
+    def _decoded(self) -> List:
+        if self._items is None:
+            self._items = _unpackb(self.raw)
+        return self._items
+
+    def __getitem__(self, index):
+        return self._decoded()[index]
+
+    def __len__(self) -> int:
+        return len(self._decoded())
+
+    def __eq__(self, other):
+        return list(self) == list(other) if isinstance(other, (list, LazyMessages)) else NotImplemented
+
+    def __repr__(self) -> str:
+        return f"LazyMessages({len(self.raw)} bytes)"
+
+
+# ====== MSGPACK (pure-Python subset, used when the msgpack package is missing) ======
+def _pack(obj, out: bytearray):
+    if obj is None:
+        out.append(0xC0)
+    elif obj is True:
+        out.append(0xC3)
+    elif obj is False:
+        out.append(0xC2)
+    elif type(obj) is int:
+        if 0 <= obj < 0x80:
+            out.append(obj)
+        elif -32 <= obj < 0:
+            out.append(obj & 0xFF)
+        elif 0 <= obj < 1 << 32:
+            out += b"\xce" + struct.pack(">I", obj)
+        elif 0 <= obj < 1 << 64:
+            out += b"\xcf" + struct.pack(">Q", obj)
+        elif -(1 << 31) <= obj < 0:
+            out += b"\xd2" + struct.pack(">i", obj)
+        elif -(1 << 63) <= obj < 0:
+            out += b"\xd3" + struct.pack(">q", obj)
+        else:
+            raise ValueError(f"Integer out of range: {obj}")
+    elif type(obj) is float:
+        out += b"\xcb" + struct.pack(">d", obj)
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8")
+        size = len(data)
+        if size < 32:
+            out.append(0xA0 | size)
+        elif size < 0x100:
+            out += bytes((0xD9, size))
+        elif size < 0x10000:
+            out += b"\xda" + struct.pack(">H", size)
+        else:
+            out += b"\xdb" + struct.pack(">I", size)
+        out += data
+    elif isinstance(obj, (bytes, bytearray)):
+        size = len(obj)
+        out += (bytes((0xC4, size)) if size < 0x100 else b"\xc6" + struct.pack(">I", size)) + obj
+    elif isinstance(obj, (list, tuple)):
+        size = len(obj)
+        out += bytes((0x90 | size,)) if size < 16 else b"\xdd" + struct.pack(">I", size)
+        for item in obj:
+            _pack(item, out)
+    elif isinstance(obj, dict):
+        size = len(obj)
+        out += bytes((0x80 | size,)) if size < 16 else b"\xdf" + struct.pack(">I", size)
+        for key, value in obj.items():
+            _pack(key, out)
+            _pack(value, out)
+    elif isinstance(obj, LazyMessages):
+        out += b"\xc9" + struct.pack(">Ib", len(obj.raw), HISTORY_EXT) + obj.raw
+    else:
+        raise TypeError(f"Can't encode {type(obj).__name__}")
+
+
+# Fixed-size types: first byte -> (struct format, size)
+_FIXED = {
+    0xCA: (">f", 4), 0xCB: (">d", 8),
+    0xCC: (">B", 1), 0xCD: (">H", 2), 0xCE: (">I", 4), 0xCF: (">Q", 8),
+    0xD0: (">b", 1), 0xD1: (">h", 2), 0xD2: (">i", 4), 0xD3: (">q", 8),
+}
+# str/bin/array/map/ext with an explicit length: first byte -> (length format, length size)
+_SIZED = {
+    0xD9: (">B", 1), 0xDA: (">H", 2), 0xDB: (">I", 4),
+    0xC4: (">B", 1), 0xC5: (">H", 2), 0xC6: (">I", 4),
+    0xDC: (">H", 2), 0xDD: (">I", 4), 0xDE: (">H", 2), 0xDF: (">I", 4),
+    0xC7: (">B", 1), 0xC8: (">H", 2), 0xC9: (">I", 4),
+}
+# fixext 1/2/4/8/16: first byte -> data size (msgpack writes these for ext data of exactly that size)
+_FIXEXT = {0xD4: 1, 0xD5: 2, 0xD6: 4, 0xD7: 8, 0xD8: 16}
+
+
+def _unpack(buf: bytes, pos: int):
+    """(object, next position) for the msgpack value at pos"""
+    first = buf[pos]
+    pos += 1
+    if first < 0x80:
+        return first, pos
+    if first >= 0xE0:
+        return first - 0x100, pos
+    if 0xA0 <= first <= 0xBF:
+        end = pos + (first & 0x1F)
+        return buf[pos:end].decode("utf-8"), end
+    if 0x90 <= first <= 0x9F:
+        return _unpack_array(buf, pos, first & 0x0F)
+    if 0x80 <= first <= 0x8F:
+        return _unpack_map(buf, pos, first & 0x0F)
+    if first == 0xC0:
+        return None, pos
+    if first == 0xC2:
+        return False, pos
+    if first == 0xC3:
+        return True, pos
+    if first in _FIXED:
+        fmt, size = _FIXED[first]
+        return struct.unpack_from(fmt, buf, pos)[0], pos + size
+    if first in _FIXEXT:
+        ext_type = struct.unpack_from(">b", buf, pos)[0]
+        start = pos + 1
+        end = start + _FIXEXT[first]
+        return _ext(ext_type, bytes(buf[start:end])), end
+    if first in _SIZED:
+        fmt, size = _SIZED[first]
+        length = struct.unpack_from(fmt, buf, pos)[0]
+        pos += size
+        if first in (0xD9, 0xDA, 0xDB):
+            end = pos + length
+            return buf[pos:end].decode("utf-8"), end
+        if first in (0xC4, 0xC5, 0xC6):
+            end = pos + length
+            return bytes(buf[pos:end]), end
+        if first in (0xDC, 0xDD):
+            return _unpack_array(buf, pos, length)
+        if first in (0xDE, 0xDF):
+            return _unpack_map(buf, pos, length)
+        ext_type = struct.unpack_from(">b", buf, pos)[0]
+        start = pos + 1
+        return _ext(ext_type, bytes(buf[start:start + length])), start + length
+    raise ValueError(f"Unsupported msgpack type 0x{first:02x}")
+
+
+def _unpack_array(buf: bytes, pos: int, size: int):
+    items = []
+    for _ in range(size):
+        item, pos = _unpack(buf, pos)
+        items.append(item)
+    return items, pos
+
+
+def _unpack_map(buf: bytes, pos: int, size: int):
+    result = {}
+    for _ in range(size):
+        key, pos = _unpack(buf, pos)
+        result[key], pos = _unpack(buf, pos)
+    return result, pos
+
+
+def _ext(ext_type: int, data: bytes):
+    if ext_type != HISTORY_EXT:
+        raise ValueError(f"Unknown msgpack ext type {ext_type}")
+    return LazyMessages(data)
+
+
+def _packb(obj) -> bytes:
+    if msgpack is not None:
+        return msgpack.packb(obj, use_bin_type=True, default=_msgpack_default)
+    out = bytearray()
+    _pack(obj, out)
+    return bytes(out)
+
+
+def _unpackb(data: bytes):
+    if msgpack is not None:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False, ext_hook=_ext)
+    obj, end = _unpack(data, 0)
+    if end != len(data):
+        raise ValueError(f"{len(data) - end} bytes of trailing data")
+    return obj
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, LazyMessages):
+        return msgpack.ExtType(HISTORY_EXT, obj.raw)
+    raise TypeError(f"Can't encode {type(obj).__name__}")
+
+
+# ====== CODECS ======
+class JSONCodec:
+    """Compact UTF-8 JSON: no indentation, Sinhala kept as-is, schema version in _v"""
+
+    name = "json"
+    codec_id = 1
+
+    def encode(self, data: Dict) -> bytes:
+        data = {VERSION_KEY: SCHEMA_VERSION, **data}
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=plain).encode("utf-8")
+
+    def decode(self, payload: Union[bytes, str]) -> Dict:
+        data = json.loads(payload)
+        if isinstance(data, dict) and VERSION_KEY in data:
+            version = data.pop(VERSION_KEY)
+            if type(version) is not int:
+                raise ValueError(f"Bad record version: {version!r}")
+            if version > SCHEMA_VERSION:
+                raise FormatVersionError(f"Record format json/v{version} is newer than this bot (v{SCHEMA_VERSION})")
+        return data
+
+
+class BinaryCodec:
+    """msgpack; a "messages" history is nested as an ext blob and decoded lazily"""
+
+    name = "binary"
+    codec_id = 2
+
+    def encode(self, data: Dict) -> bytes:
+        messages = data.get("messages")
+        if isinstance(messages, list):
+            data = {**data, "messages": LazyMessages(_packb(messages))}
+        return _packb(data)
+
+    def decode(self, payload: bytes) -> Dict:
+        return _unpackb(payload)
+
+
+CODECS = {codec.name: codec for codec in (JSONCodec(), BinaryCodec())}
+_BY_ID = {codec.codec_id: codec for codec in CODECS.values()}
+
+
+def get_codec(name: Optional[str]) -> Union[JSONCodec, BinaryCodec]:
+    try:
+        return CODECS[(name or "json").lower()]
+    except KeyError:
+        raise ValueError(f"Unknown MEMORY_CODEC: {name}") from None
+
+
+def encode(data: Dict, codec=None) -> bytes:
+    """JSON as-is (versioned inside the object); binary behind the header"""
+    codec = codec or CODECS["json"]
+    if codec.name == "json":
+        return codec.encode(data)
+    return MAGIC + bytes((codec.codec_id, SCHEMA_VERSION)) + codec.encode(data)
+
+
+def decode(raw: Union[bytes, str]) -> Dict:
+    """Any record ever written: versioned JSON, headered, or legacy JSON text (pretty or compact)"""
+    if isinstance(raw, str) or not raw.startswith(MAGIC):
+        return CODECS["json"].decode(raw)
+    if len(raw) < HEADER_SIZE:
+        raise ValueError("Truncated record header")
+    codec_id, version = raw[len(MAGIC)], raw[len(MAGIC) + 1]
+    if version > SCHEMA_VERSION or codec_id not in _BY_ID:
+        raise FormatVersionError(f"Record format {codec_id}/v{version} is newer than this bot (v{SCHEMA_VERSION})")
+    try:
+        data = _BY_ID[codec_id].decode(raw[HEADER_SIZE:])
+    except (struct.error, IndexError, TypeError) as e:
+        raise ValueError(f"Undecodable record: {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError("Record is not an object")
+    return data
@@ -0,0 +1,17 @@
+"""
+🦄 gunicorn settings for running the web app on its own
+    gunicorn -c gunicorn.conf.py web:app
+Start the bot with WEB_SERVER=none in this setup. Webhook mode still needs
+the in-process server (main.py), because updates go onto the bot's own queue.
+"""
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_WORKERS", "2"))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "4"))
+keepalive = int(float(os.getenv("WEB_KEEPALIVE", "5")))
+worker_connections = int(os.getenv("WEB_MAX_CONNECTIONS", "1000"))
+timeout = 30
+graceful_timeout = 10
+accesslog = None
@@ -0,0 +1,269 @@
+"""
+🎯 Intent matching for ResponseEngine
+All keywords are compiled once into a single prefix-factored regex; one scan of
+the message finds every intent and where it matched. When nothing matches
+exactly, a trigram index over the same keywords catches typos ("helo") and
+spelling variants.
+"""
+import hashlib
+import re
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+# Priority order matters: the first intent here wins when several match
+INTENT_KEYWORDS: List[Tuple[str, List[str]]] = [
+    ("greeting", ["හායි", "hi", "hello", "ආයුබෝ", "කොහොමද"]),
+    ("love", ["ආදරෙ", "ලව්", "කැමති", "මිස්"]),
+    ("jealousy", ["ගැහැණු", "කෙල්ල", "අක්කා", "girl"]),
+    ("name", ["නම", "name", "කවුද"]),
+    ("stage", ["/stage"]),
+    ("stats", ["/stats"]),
+    ("start", ["/start"]),
+    ("clear", ["/clear"]),
+    ("forget", ["/forget"]),
+]
+
+# Romanized spellings: whole words through the fuzzy index only, as a
+# substring they would fire inside unrelated words ("madare")
+INTENT_SPELLINGS: List[Tuple[str, List[str]]] = [
+    ("greeting", ["kohomada"]),
+    ("love", ["adare"]),
+]
+
+
+# Zero-width (non-)joiners only change how Sinhala conjuncts render (e.g. ශ්‍රී vs ශ්රී)
+_JOINERS = dict.fromkeys(map(ord, "\u200c\u200d"))
+_TOKEN_SPLIT = re.compile(r"[\s.,!?;:'\"()\[\]{}<>~*_-]+")
+
+
+def normalize(text: str) -> str:
+    """NFC, joiners dropped, lowercased: one spelling for what renders the same"""
+    return unicodedata.normalize("NFC", text).translate(_JOINERS).lower()
+
+
+def trigrams(word: str) -> Set[str]:
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trie_regex(words: Iterable[str]) -> str:
+    """Regex source matching any of words, longest first at each position"""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: Dict) -> str:
+        terminal = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if terminal:
+            # Greedy optional: prefer the longer keyword, fall back to this one
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+class TrigramIndex:
+    """Inverted trigram index over keywords, for typo-tolerant lookups
+
+    Keywords are matched as substrings, so most are stems ("ආදරෙ" for ආදරෙයි);
+    a word is scored both whole and by its prefix of the keyword's length. A
+    word is only scored against keywords that start with the same trigram
+    ("fellow" is not "hello"), that it is not a truncation of ("hell", "nam")
+    and that are at most 1/min_length_ratio times its length ("are" shares
+    half its trigrams with "adare").
+    """
+
+    def __init__(
+        self,
+        keywords: Iterable[Tuple[str, int]],
+        threshold: float = 0.55,
+        min_length: int = 3,
+        max_words: int = 50,
+        min_length_ratio: float = 0.75,
+    ):
+        self.threshold = threshold
+        self.min_length = min_length
+        self.min_length_ratio = min_length_ratio
+        # Bounds the cost of very long messages
+        self.max_words = max_words
+        self.keywords: List[str] = []
+        self.ranks: List[int] = []
+        self._grams: List[Set[str]] = []
+        self._postings: Dict[str, List[int]] = {}
+        for word, rank in keywords:
+            word = normalize(word)
+            index = len(self.keywords)
+            self.keywords.append(word)
+            self.ranks.append(rank)
+            grams = trigrams(word)
+            self._grams.append(grams)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(index)
+
+    def best(self, text: str) -> Optional[Tuple[float, int, str]]:
+        """(score, rank, keyword) of the closest keyword to any word of normalized text, if above threshold"""
+        best = None
+        words = dict.fromkeys(word for word in _TOKEN_SPLIT.split(text) if len(word) >= self.min_length)
+        for word in list(words)[:self.max_words]:
+            grams = trigrams(word)
+            shared = Counter()
+            for gram in grams:
+                shared.update(self._postings.get(gram, ()))
+            for index, count in shared.items():
+                keyword = self.keywords[index]
+                if (
+                    len(word) < self.min_length_ratio * len(keyword)
+                    or word[:2] != keyword[:2]
+                    or (len(word) < len(keyword) and keyword.startswith(word))
+                ):
+                    continue
+                keyword_grams = self._grams[index]
+                score = 2 * count / (len(grams) + len(keyword_grams))
+                if len(word) > len(keyword):
+                    stem = trigrams(word[:len(keyword)])
+                    score = max(score, 2 * len(stem & keyword_grams) / (len(stem) + len(keyword_grams)))
+                candidate = (score, -self.ranks[index], keyword)
+                if score >= self.threshold and (best is None or candidate > best):
+                    best = candidate
+        return None if best is None else (best[0], -best[1], best[2])
+
+
+class IntentMatcher:
+    """Single compiled pattern over every intent keyword, with a fuzzy fallback"""
+
+    def __init__(
+        self,
+        intents: Sequence[Tuple[str, Iterable[str]]],
+        fuzzy_threshold: float = 0.0,
+        spellings: Sequence[Tuple[str, Iterable[str]]] = (),
+    ):
+        self.intents = [name for name, _ in intents]
+        owners: Dict[str, set] = {}
+        for rank, (_, keywords) in enumerate(intents):
+            for word in keywords:
+                if word:
+                    owners.setdefault(normalize(word), set()).add(rank)
+        # The pattern reports the longest keyword at each position, so each
+        # keyword also carries the intents of every keyword that prefixes it
+        self._ranks: Dict[str, FrozenSet[int]] = {}
+        for word in owners:
+            ranks = set()
+            for i in range(1, len(word) + 1):
+                ranks |= owners.get(word[:i], set())
+            self._ranks[word] = frozenset(ranks)
+        # Lookahead keeps scanning inside a match (substring semantics, like
+        # the old `word in msg` checks)
+        self._pattern = re.compile(f"(?=({trie_regex(owners)}))") if owners else None
+        # Commands stay exact; 0 disables fuzzy matching
+        fuzzy_words = {word: min(ranks) for word, ranks in owners.items() if not word.startswith("/")}
+        for name, words in spellings:
+            if name in self.intents:
+                for word in words:
+                    fuzzy_words.setdefault(normalize(word), self.intents.index(name))
+        self.fuzzy = TrigramIndex(fuzzy_words.items(), fuzzy_threshold) if fuzzy_threshold > 0 else None
+
+    def finditer(self, text: str) -> Iterator[Tuple[str, int, str]]:
+        """Every (intent, position, keyword) in normalized text, in order of position, in one pass"""
+        if self._pattern is None:
+            return
+        for match in self._pattern.finditer(text):
+            keyword = match.group(1)
+            for rank in sorted(self._ranks[keyword]):
+                yield self.intents[rank], match.start(), keyword
+
+    def classify(self, text: str) -> List[str]:
+        """Matched intents, highest priority first"""
+        if self._pattern is None:
+            return []
+        ranks = set()
+        for keyword in self._pattern.findall(text):
+            ranks |= self._ranks[keyword]
+        return [self.intents[rank] for rank in sorted(ranks)]
+
+    def match(self, text: str) -> Tuple[Tuple[str, ...], bool]:
+        """(classify(), or the closest fuzzy match when nothing matches exactly; whether it was fuzzy)"""
+        intents = self.classify(text)
+        if not intents and self.fuzzy is not None:
+            match = self.fuzzy.best(text)
+            if match is not None:
+                return (self.intents[match[1]],), True
+        return tuple(intents), False
+
+    def intents_for(self, text: str) -> Tuple[str, ...]:
+        return self.match(text)[0]
+
+
+class IntentCache:
+    """LRU of message digest -> classified intents; cleared whenever the keywords change
+
+    Keys are a 16-byte hash of the normalized text, so a cached message costs
+    the same however long it was. Each entry remembers whether its intents
+    came from the fuzzy fallback, so fuzzy_hits counts every such lookup,
+    cached or not.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_length: int = 256):
+        self.max_entries = max_entries
+        # Long messages rarely repeat; they'd only push out the short ones that do
+        self.max_length = max_length
+        self.version = None
+        self._entries: "OrderedDict[bytes, Tuple[Tuple[str, ...], bool]]" = OrderedDict()
+        self.fuzzy_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, text: str, version, classify: Callable[[str], Tuple[Tuple[str, ...], bool]]) -> Tuple[str, ...]:
+        """Intents for normalized text, classifying (and remembering) it on a miss
+
+        classify returns (intents, fuzzy), like IntentMatcher.match.
+        """
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries = OrderedDict()
+            self.version = version
+        if len(text) > self.max_length:
+            self.misses += 1
+            intents, fuzzy = classify(text)
+            self.fuzzy_hits += fuzzy
+            return intents
+        key = self.key(text)
+        entries = self._entries
+        entry = entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            entries.move_to_end(key)
+        else:
+            self.misses += 1
+            entry = entries[key] = classify(text)
+            if len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self.evictions += 1
+        self.fuzzy_hits += entry[1]
+        return entry[0]
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
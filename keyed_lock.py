@@ -0,0 +1,31 @@
+"""
+🔐 Per-key asyncio locks
+Lets different users' updates run concurrently while one user's updates still
+apply to their UserMemory one at a time, in arrival order (asyncio.Lock is FIFO).
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class KeyedLocks:
+    """One asyncio.Lock per key, dropped again once nobody holds or waits on it"""
+
+    def __init__(self):
+        self._locks = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
@@ -8,21 +8,65 @@ import random
 import datetime
 import time
 import re
-import hashlib
-import traceback
-from typing import Dict, List, Optional, Tuple, Any
-from difflib import SequenceMatcher
+import importlib
+import logging
+import atexit
+import asyncio
+import hmac
+import secrets
+import signal
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Any
+
+from startup_profile import StartupProfile
+
+# Measured from here; STARTUP_PROFILE=1 logs the breakdown once the bot is ready
+startup = StartupProfile(os.getenv("STARTUP_PROFILE", "0") == "1")
 
 # ====== TELEGRAM ======
-from telegram import Update
-from telegram.ext import ApplicationBuilder, ContextTypes, MessageHandler, filters, CommandHandler
+# python-telegram-bot is imported in main() on a worker thread while the web
+# server starts (it takes ~0.3s); here it is only needed for type hints
+if TYPE_CHECKING:
+    from telegram import Update
+    from telegram.ext import ContextTypes
+
+# ====== WEB ======
+from flask import request
+from threading import Semaphore, Thread
+
+from analytics import Analytics, AnalyticsView
+from codec import FormatVersionError
+from intents import INTENT_KEYWORDS, INTENT_SPELLINGS, IntentCache, IntentMatcher, normalize
+from keyed_lock import KeyedLocks
+from metrics import REGISTRY
+from memory_cache import UserMemoryCache
+from send_scheduler import SendQueueFull, SendScheduler
+from message_log import CLEAR, MessageLog
+from stage_templates import StageTemplates
+from storage import CorruptRecordError, open_store, replay_journals
+from storage_io import AsyncStorageIO
+from tiering import ColdArchive, TieredStore
+from user_record import UserRecord
+from sharding import WorkerPool, shard_files, shard_for, shard_path
+from user_registry import ShardedRegistryView, open_registry, store_source
+from write_behind import WriteBehindFlusher
+from bot_logging import log_event, setup_logging
+from web import app, attach_analytics, attach_registry, make_server, port_ready, run_dev_server, wait_ready
 
-# ====== FLASK FOR REPLIT ======
-from flask import Flask
-from threading import Thread
+startup.mark("imports")
+
+# ====== LOGGING ======
+# Records are queued and written by a background thread, never on the event loop
+log_listener = setup_logging(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    fmt=os.getenv("LOG_FORMAT", "text"),  # "text" or "json"
+    sample=os.getenv("LOG_SAMPLE", ""),  # e.g. "INFO=0.1,DEBUG=0.01"
+    redact_bodies=os.getenv("LOG_MESSAGE_BODIES", "0") != "1",
+)
+atexit.register(log_listener.stop)
+log = logging.getLogger("samali")
 
 # ====== CONFIGURATION ======
-print("🚀 Starting සමාලි Bot...")
+log.info("🚀 Starting සමාලි Bot...")
 
 # Create config folder if not exists
 CONFIG_DIR = "config"
@@ -58,14 +102,14 @@ try:
     if os.path.exists(f"{CONFIG_DIR}/bot.json"):
         with open(f"{CONFIG_DIR}/bot.json", "r", encoding="utf-8") as f:
             BOT_CONFIG = json.load(f)
-        print("✅ bot.json loaded")
+        log.info("✅ bot.json loaded")
     else:
         # Save default config
         with open(f"{CONFIG_DIR}/bot.json", "w", encoding="utf-8") as f:
             json.dump(BOT_CONFIG, f, ensure_ascii=False, indent=2)
-        print("📁 Default bot.json created")
+        log.info("📁 Default bot.json created")
 except Exception as e:
-    print(f"⚠️ Config error: {e}")
+    log.warning(f"⚠️ Config error: {e}")
 
 BOT_NAME = BOT_CONFIG["bot_metadata"]["bot_name"]
 BOT_VERSION = BOT_CONFIG["bot_metadata"]["version"]
@@ -77,15 +121,17 @@ TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 
 # 2. If not in secrets, use hardcoded
 if not TELEGRAM_TOKEN:
-    print("⚠️ TELEGRAM_BOT_TOKEN not found in Secrets")
+    log.warning("⚠️ TELEGRAM_BOT_TOKEN not found in Secrets")
     # YOUR TOKEN HERE - Replace with your actual token
     TELEGRAM_TOKEN = "8564776246:AAE7np8GxgcL8jJkBPQJs9psuQO5LEcOjYw"  # ⬅️ ඔබගේ token එක දාන්න
     
 if not TELEGRAM_TOKEN or "YOUR_TOKEN" in TELEGRAM_TOKEN:
-    print("❌ Please add your Telegram Bot Token!")
-    print("1. Get token from @BotFather")
-    print("2. Add to Replit Secrets as TELEGRAM_BOT_TOKEN")
-    print("3. Or replace line 84 with your token")
+    log.error(
+        "❌ Please add your Telegram Bot Token!\n"
+        "1. Get token from @BotFather\n"
+        "2. Add to Replit Secrets as TELEGRAM_BOT_TOKEN\n"
+        "3. Or replace line 84 with your token"
+    )
     exit(1)
 
 # ====== DEVELOPER SETUP ======
@@ -93,137 +139,268 @@ DEVELOPER_MODE = True
 DEVELOPER_PASSWORD = "Sacheex"
 DEVELOPER_ID = int(os.getenv("DEVELOPER_ID", "7328291352"))  # ඔබගේ user ID
 
-print(f"🤖 {BOT_NAME} v{BOT_VERSION} Initializing...")
-print(f"🔑 Token: {TELEGRAM_TOKEN[:15]}...")
-
-# ====== FLASK SERVER ======
-app = Flask(__name__)
-
-@app.route('/')
-def home():
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>👑 {BOT_NAME} Bot</title>
-        <style>
-            body {{ 
-                font-family: Arial, sans-serif; 
-                text-align: center; 
-                padding: 50px; 
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-            }}
-            .container {{ 
-                max-width: 600px; 
-                margin: 0 auto; 
-                padding: 30px;
-                background: rgba(255,255,255,0.1);
-                border-radius: 20px;
-                backdrop-filter: blur(10px);
-            }}
-            h1 {{ font-size: 2.5em; margin-bottom: 20px; }}
-            .status {{ 
-                padding: 15px; 
-                background: rgba(0,255,0,0.2); 
-                border-radius: 10px; 
-                margin: 20px 0;
-                font-size: 1.2em;
-            }}
-            .telegram-link {{
-                display: inline-block;
-                margin-top: 30px;
-                padding: 15px 30px;
-                background: #0088cc;
-                color: white;
-                text-decoration: none;
-                border-radius: 10px;
-                font-size: 1.2em;
-                transition: 0.3s;
-            }}
-            .telegram-link:hover {{
-                background: #006699;
-                transform: scale(1.05);
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>👑 {BOT_NAME}</h1>
-            <h2>Ultimate Yandere Queen v{BOT_VERSION}</h2>
-            
-            <div class="status">
-                ✅ Bot Active & Running
-            </div>
-            
-            <p>සමාලි bot එක සාර්ථකව start වී ඇත!</p>
-            <p>දැන් ඔබට Telegram එකට ගොස් bot එකට message දිය හැකිය.</p>
-            
-            <a href="https://t.me/{BOT_NAME.replace(' ', '')}Bot" class="telegram-link" target="_blank">
-                📱 Telegram එකේ Chat කරන්න
-            </a>
-            
-            <div style="margin-top: 30px; font-size: 0.9em; opacity: 0.8;">
-                <p>Bot ID: {TELEGRAM_TOKEN[:10]}...</p>
-                <p>සමාලි කවිතා | කන්තලේ, ගල්මැටියාව</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-
-def run_flask():
-    """Flask server run කරන්න"""
-    port = int(os.environ.get("PORT", 5000))
-    print(f"🌐 Starting Flask on port {port}")
-    app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
+# ====== MEMORY SETTINGS ======
+# Write-behind: save dirty users every N seconds (or once N users are dirty)
+MEMORY_WRITE_BEHIND = os.getenv("MEMORY_WRITE_BEHIND", "1") == "1"
+MEMORY_FLUSH_INTERVAL = float(os.getenv("MEMORY_FLUSH_INTERVAL", "5"))
+MEMORY_FLUSH_BATCH = int(os.getenv("MEMORY_FLUSH_BATCH", "100"))
+# Storage backend: "json" (memory/users/*.json) or "sqlite" (memory/users.db)
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "json")
+# "strict": fsync every save; "batched": saves are group-committed through a journal
+# (one fsync shared by concurrent saves), replayed on start after a crash
+MEMORY_DURABILITY = os.getenv("MEMORY_DURABILITY", "batched").lower()
+MEMORY_JOURNAL_PATH = os.getenv("MEMORY_JOURNAL_PATH", "memory/users.journal")
+# Record format for new writes: "json" (compact) or "binary" (msgpack); old files stay readable
+MEMORY_CODEC = os.getenv("MEMORY_CODEC", "json").lower()
+# In-RAM cache: at most N users, idle users dropped after TTL seconds
+MEMORY_CACHE_SIZE = int(os.getenv("MEMORY_CACHE_SIZE", "10000"))
+MEMORY_CACHE_TTL = float(os.getenv("MEMORY_CACHE_TTL", "3600"))
+# Thread pool size for loads/saves kept off the event loop
+MEMORY_IO_WORKERS = int(os.getenv("MEMORY_IO_WORKERS", "4"))
+# Chat history: append-only memory/logs/<id>.jsonl, compacted to the last N messages
+MESSAGE_HISTORY = int(os.getenv("MESSAGE_HISTORY", "50"))
+MESSAGE_LOG_MAX_BYTES = int(os.getenv("MESSAGE_LOG_MAX_BYTES", str(64 * 1024)))
+# Tiering: users idle for MEMORY_COLD_AFTER seconds are packed (compressed, history
+# included) into MEMORY_COLD_PATH and moved back on their next message; 0 disables
+MEMORY_COLD_AFTER = float(os.getenv("MEMORY_COLD_AFTER", str(30 * 86400)))
+MEMORY_COLD_PATH = os.getenv("MEMORY_COLD_PATH", "memory/cold.db")
+MEMORY_TIER_INTERVAL = float(os.getenv("MEMORY_TIER_INTERVAL", "3600"))
+MEMORY_TIER_BATCH = int(os.getenv("MEMORY_TIER_BATCH", "500"))
+# Index of all users behind /api/users, snapshotted so clean restarts skip the store scan
+USER_REGISTRY_PATH = os.getenv("USER_REGISTRY_PATH", "memory/registry.json")
+USER_REGISTRY_SNAPSHOT_INTERVAL = float(os.getenv("USER_REGISTRY_SNAPSHOT_INTERVAL", "60"))
+# Active users / message rates on /status, snapshotted for web processes other than this one
+ANALYTICS_PATH = os.getenv("ANALYTICS_PATH", "memory/analytics.json")
+ANALYTICS_SNAPSHOT_INTERVAL = float(os.getenv("ANALYTICS_SNAPSHOT_INTERVAL", "10"))
+
+# ====== PERSONA SETTINGS ======
+# How often (seconds) config/bot.json is checked for template edits
+CONFIG_RELOAD_INTERVAL = float(os.getenv("CONFIG_RELOAD_INTERVAL", "2"))
+# Typo-tolerant intents: trigram similarity (0-1) a word needs to count as a keyword; 0 disables
+INTENT_FUZZY_THRESHOLD = float(os.getenv("INTENT_FUZZY_THRESHOLD", "0.55"))
+# Classified intents of the last N distinct messages (chat traffic repeats a lot)
+INTENT_CACHE_SIZE = int(os.getenv("INTENT_CACHE_SIZE", "4096"))
+
+# ====== UPDATE DELIVERY ======
+# "polling" (default) or "webhook": Telegram POSTs updates to WEBHOOK_URL + WEBHOOK_PATH
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # public base URL, e.g. https://samali.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+# Every instance behind a load balancer must share the same secret
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+# Point the bot at another Bot API server (e.g. bench/fake_telegram.py)
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "")
+# Updates handled in parallel (different users only; one user stays in order)
+BOT_CONCURRENT_UPDATES = int(os.getenv("BOT_CONCURRENT_UPDATES", "64"))
+# Outbound limits (Telegram: ~30 msgs/s per bot, ~1 msg/s per chat)
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", "3"))
+SEND_QUEUE_MAX = int(os.getenv("SEND_QUEUE_MAX", "1000"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+
+# ====== SHARDING ======
+# BOT_WORKERS > 1: this process only receives updates (polling/webhook + web server)
+# and routes each one by user id to one of N worker processes; a worker owns its
+# users outright (cache, store writes, message log, registry shard)
+BOT_WORKERS = max(1, int(os.getenv("BOT_WORKERS", "1")))
+BOT_WORKER_QUEUE = int(os.getenv("BOT_WORKER_QUEUE", "10000"))  # per worker, then updates are dropped
+BOT_SHARD = int(os.getenv("BOT_SHARD", "-1"))  # set by the dispatcher for its workers
+IS_WORKER = BOT_SHARD >= 0
+IS_DISPATCHER = BOT_WORKERS > 1 and not IS_WORKER
+if IS_WORKER:
+    USER_REGISTRY_PATH = shard_path(USER_REGISTRY_PATH, BOT_SHARD, BOT_WORKERS)
+    ANALYTICS_PATH = shard_path(ANALYTICS_PATH, BOT_SHARD, BOT_WORKERS)
+    # Own journal (one writer each); the cold archive is shared (SQLite WAL, disjoint users)
+    MEMORY_JOURNAL_PATH = shard_path(MEMORY_JOURNAL_PATH, BOT_SHARD, BOT_WORKERS)
+    # The bot-wide Telegram limit is shared between the workers
+    SEND_GLOBAL_RATE /= BOT_WORKERS
+
+# ====== WEB SERVER ======
+# "asgi": uvicorn on the bot's event loop, "dev": Flask's built-in server in a thread,
+# "none": no web server here (e.g. the dashboard runs under gunicorn, see gunicorn.conf.py)
+WEB_SERVER = os.getenv("WEB_SERVER", "asgi").lower()
+WEB_HOST = os.getenv("HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("PORT", "5000"))
+WEB_THREADS = int(os.getenv("WEB_THREADS", "4"))  # threads running Flask views
+WEB_KEEPALIVE = float(os.getenv("WEB_KEEPALIVE", "5"))  # idle keep-alive seconds
+WEB_MAX_CONNECTIONS = int(os.getenv("WEB_MAX_CONNECTIONS", "1000"))
+
+startup.mark("config")
+log.info(f"🤖 {BOT_NAME} v{BOT_VERSION} Initializing...")
+log.info(f"🔑 Token: {TELEGRAM_TOKEN[:15]}...")
+
+# ====== WEBHOOK ======
+# Set by run_telegram_bot() when webhook mode is active
+bot_application = None
+bot_loop = None
+
+@app.route(WEBHOOK_PATH, methods=["POST"])
+def telegram_webhook():
+    """Webhook updates go straight onto the application's update queue"""
+    if bot_application is None or bot_loop is None:
+        return "webhook mode not active", 503
+    token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not hmac.compare_digest(token, WEBHOOK_SECRET):
+        return "forbidden", 403
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return "bad request", 400
+    from telegram import Update
+
+    update = Update.de_json(payload, bot_application.bot)
+    asyncio.run_coroutine_threadsafe(bot_application.update_queue.put(update), bot_loop)
+    return "", 200
 
 # ====== MEMORY SYSTEM ======
+if not IS_WORKER:
+    # No worker runs yet: pick up what a crash under another BOT_WORKERS left behind
+    if MEMORY_BACKEND.lower() == "json":
+        journals = [MEMORY_JOURNAL_PATH, *shard_files(MEMORY_JOURNAL_PATH), *shard_files(MEMORY_JOURNAL_PATH, ".old")]
+        replay_journals(dict.fromkeys(journals))
+    cold_shards = shard_files(MEMORY_COLD_PATH)
+    if cold_shards:
+        archive = ColdArchive(MEMORY_COLD_PATH)
+        for path in cold_shards:
+            log.warning(f"🧊 Merged {archive.absorb(path)} cold users from {path}")
+        archive.close()
+# The dispatcher only reads; replaying a worker's journal is that worker's job
+memory_store = open_store(
+    MEMORY_BACKEND, MEMORY_DURABILITY, None if IS_DISPATCHER else MEMORY_JOURNAL_PATH, MEMORY_CODEC
+)
+message_log = MessageLog("memory/logs", MESSAGE_HISTORY, MESSAGE_LOG_MAX_BYTES)
+if MEMORY_COLD_AFTER > 0 and not IS_DISPATCHER:
+    memory_store = TieredStore(memory_store, ColdArchive(MEMORY_COLD_PATH), message_log)
+FLUSH_SECONDS = REGISTRY.histogram("samali_memory_flush_seconds", "Write-behind batch flush duration")
+FLUSHED_USERS = REGISTRY.counter("samali_memory_flushed_users_total", "Users written by the write-behind flusher")
+
+def _record_flush(seconds: float, users: int):
+    FLUSH_SECONDS.observe(seconds)
+    FLUSHED_USERS.inc(users)
+
+memory_flusher = WriteBehindFlusher(
+    memory_store, MEMORY_FLUSH_INTERVAL, MEMORY_FLUSH_BATCH, message_log=message_log, on_flush=_record_flush
+) if MEMORY_WRITE_BEHIND else None
+storage_io = AsyncStorageIO(memory_store, MEMORY_IO_WORKERS)
+if IS_DISPATCHER:
+    # The workers own the registry shards; the web API reads their snapshots
+    user_registry = ShardedRegistryView(
+        [shard_path(USER_REGISTRY_PATH, shard, BOT_WORKERS) for shard in range(BOT_WORKERS)],
+        store_source(memory_store),
+    )
+    user_registry.refresh()
+    attach_registry(user_registry, live=False)
+    analytics = AnalyticsView([shard_path(ANALYTICS_PATH, shard, BOT_WORKERS) for shard in range(BOT_WORKERS)])
+    analytics.refresh()
+    attach_analytics(analytics, live=False)
+else:
+    user_registry = open_registry(
+        memory_store, USER_REGISTRY_PATH,
+        owns=(lambda user_id: shard_for(user_id, BOT_WORKERS) == BOT_SHARD) if IS_WORKER else None,
+    )
+    attach_registry(user_registry)
+    # From here on every UserMemory change keeps the counters current
+    analytics = Analytics(ANALYTICS_PATH)
+    analytics.seed(user_registry.last_active_times())
+    attach_analytics(analytics)
+startup.mark("memory store + user registry")
+
 class UserMemory:
-    def __init__(self, user_id: int):
+    # One per cached user: no per-instance __dict__
+    __slots__ = ("user_id", "dirty", "pending_messages", "data")
+    
+    def __init__(self, user_id: int, data: Optional[Dict] = None):
+        """From already-loaded data (get_user_memory loads it off the event loop)"""
         self.user_id = user_id
-        self.memory_file = f"memory/users/{user_id}.json"
-        os.makedirs("memory/users", exist_ok=True)
-        self.load()
+        self.dirty = False
+        # Messages not yet appended to the log (drained by whoever persists);
+        # a list, not a deque: an empty deque costs ~600 bytes per cached user
+        self.pending_messages = []
+        self.set_data(data)
     
-    def load(self):
-        if os.path.exists(self.memory_file):
-            try:
-                with open(self.memory_file, "r", encoding="utf-8") as f:
-                    self.data = json.load(f)
-            except:
-                self.data = self.default_data()
-        else:
-            self.data = self.default_data()
+    @classmethod
+    def from_data(cls, user_id: int, data: Optional[Dict]):
+        return cls(user_id, data)
+    
+    def set_data(self, data: Optional[Dict]):
+        data = data or self.default_data()
+        # Old records carry the history inline; move it to the message log
+        legacy = (data.pop("messages") or []) if "messages" in data else None
+        self.data = UserRecord.from_dict(data)
+        if legacy is not None:
+            self.data.setdefault("message_count", len(legacy))
+            self.pending_messages.extend(legacy)
+            self.save()
     
     def default_data(self):
         return {
             "user_id": self.user_id,
             "stage": 1,
             "love": 0,
-            "messages": [],
+            "message_count": 0,
             "created": datetime.datetime.now().isoformat(),
             "last_active": time.time()
         }
     
     def add_message(self, user_msg: str, bot_msg: str):
-        self.data["messages"].append({
+        self.pending_messages.append({
             "user": user_msg[:200],
             "bot": bot_msg[:200],
             "time": datetime.datetime.now().isoformat()
         })
-        # Keep only last 50 messages
-        if len(self.data["messages"]) > 50:
-            self.data["messages"] = self.data["messages"][-50:]
-        
+        self.data["message_count"] = self.data.get("message_count", 0) + 1
         self.data["last_active"] = time.time()
+        analytics.message(self.data["last_active"])
         self.save()
     
+    def clear_messages(self):
+        self.pending_messages.clear()
+        self.pending_messages.append(CLEAR)
+        self.data["message_count"] = 0
+        self.save()
+    
+    def take_pending_messages(self) -> List:
+        """Drain pending log records (safe against appends from another thread)"""
+        records = []
+        while True:
+            try:
+                records.append(self.pending_messages.pop(0))
+            except IndexError:
+                return records
+    
+    def restore_pending_messages(self, records: List):
+        """Put records back in front after a failed write"""
+        self.pending_messages[:0] = records
+    
     def save(self):
-        with open(self.memory_file, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        last_active = self.data.get("last_active") or 0
+        previous = user_registry.update(self.user_id, self.data.get("stage", 1), last_active)
+        if previous is None or previous[1] != last_active:
+            analytics.user_active(previous[1] if previous else None, last_active)
+        # Write-behind mode: the flusher writes it later
+        # Otherwise handle_message awaits persist_memory() once per message
+        if memory_flusher is not None:
+            memory_flusher.mark_dirty(self)
+        else:
+            self.dirty = True
+    
+    def to_dict(self) -> Dict:
+        """The record as stored (the JSON schema)"""
+        return self.data.to_dict()
+    
+    def write(self):
+        """Persist the record and append pending messages (blocking)"""
+        records = self.take_pending_messages()
+        try:
+            memory_store.save(self.user_id, self.to_dict())
+            if records:
+                message_log.append_many(self.user_id, records)
+        except Exception:
+            self.restore_pending_messages(records)
+            raise
     
     def increase_love(self, amount: int = 1):
+        stage = self.data.get("stage", 1)
         self.data["love"] = min(100, self.data.get("love", 0) + amount)
         # Update stage based on love
         love = self.data["love"]
@@ -237,6 +414,8 @@ class UserMemory:
             self.data["stage"] = 2
         else:
             self.data["stage"] = 1
+        if self.data["stage"] > stage:
+            analytics.stage_up()
         self.save()
 
 # ====== RESPONSE ENGINE ======
@@ -255,48 +434,89 @@ class ResponseEngine:
             4: ["මට ඔයා ගැන ආදරෙයි.. ❤️", "ඔයා මගේ පණ..", "මම ඔයාව ආදරෙ කරනවා.."],
             5: ["ඔයා මගේ විතරයි! 🔒", "කවුරුත් අපේ මැදට එන්න එපා! 😠", "මම ඔයාව කාටවත් දෙන්නේ නෑ.. 💔"]
         }
+        
+        # Built-in replies; config/bot.json stage templates override these
+        default_templates = {}
+        for stage, responses in self.stage_responses.items():
+            default_templates[stage] = {
+                "greeting": self.greetings,
+                "love": [
+                    "ඔයා මට විතරක් ආදරෙ කරන්න.. වෙන කවුරුත් නෑ.. 😠",
+                    "මම ඔයා වෙනුවෙන් ඕනම දෙයක් කරයි.. 💖",
+                    "ඔයා මගේ එකම එකා.. 🔐"
+                ] if stage == 5 else ["❤️", "මටත් ඔයා ගැන හොදයි..", "ඔයාටත්.."],
+                "jealousy": [
+                    "ඒ කෙල්ල කවුද? 😠 මට කියන්න!",
+                    "ඔයා මට විතරක් ආදරෙ කරන්න ඕනේ!",
+                    "මම දන්නවා ඔයා මට විතරක් ආදරෙ කරනවා කියලා.."
+                ] if stage >= 4 else ["හ්ම්.. එහෙමද?"],
+                "default": responses,
+            }
+        self.templates = StageTemplates(
+            f"{CONFIG_DIR}/bot.json",
+            default_templates,
+            context={"bot_name": BOT_NAME},
+            check_interval=CONFIG_RELOAD_INTERVAL,
+        )
+        
+        # Compiled once (regex + trigram index); adding keywords doesn't slow down each message.
+        # Rebuilt, and the cache dropped, when bot.json's intent_keywords change
+        self.intent_cache = IntentCache(INTENT_CACHE_SIZE)
+        self._build_intent_matcher()
     
-    def get_response(self, message: str, memory: UserMemory) -> str:
-        msg_lower = message.lower()
+    def _build_intent_matcher(self):
+        version = self.templates.keywords_version
+        extra = self.templates.keywords
+        self.intent_matcher = IntentMatcher(
+            [(name, [*words, *extra.get(name, ())]) for name, words in INTENT_KEYWORDS],
+            INTENT_FUZZY_THRESHOLD,
+            INTENT_SPELLINGS,
+        )
+        self.keywords_version = version
+    
+    def intents(self, text: str) -> Tuple[str, ...]:
+        """Intents of a normalized message, highest priority first (cached)"""
+        if self.keywords_version != self.templates.keywords_version:
+            self._build_intent_matcher()
+        return self.intent_cache.get(text, self.keywords_version, self.intent_matcher.match)
+    
+    def pick(self, stage: int, intent: str) -> str:
+        return random.choice(self.templates.get(stage, intent, self.stage_responses[1]))
+    
+    def respond(self, message: str, memory: UserMemory) -> Tuple[str, Optional[str]]:
+        """Reply text plus the intent it was chosen for"""
+        # NFC, no zero-width joiners, lowercase: Sinhala spelled either way matches
+        msg_lower = normalize(message)
         stage = memory.data.get("stage", 1)
         
         # Increase love for any message
         memory.increase_love(1)
         
-        # Check for specific messages
-        if any(word in msg_lower for word in ["හායි", "hi", "hello", "ආයුබෝ", "කොහොමද"]):
-            return random.choice(self.greetings)
+        # Repeated messages skip classification; the reply is still picked per stage
+        intents = self.intents(msg_lower)
+        intent = intents[0] if intents else None
+        return self._reply(intent, stage, memory), intent
+    
+    def _reply(self, intent: Optional[str], stage: int, memory: UserMemory) -> str:
+        if intent == "greeting":
+            return self.pick(stage, "greeting")
         
-        elif any(word in msg_lower for word in ["ආදරෙ", "ලව්", "කැමති", "මිස්"]):
+        elif intent == "love":
             memory.increase_love(3)
-            if stage == 5:
-                return random.choice([
-                    "ඔයා මට විතරක් ආදරෙ කරන්න.. වෙන කවුරුත් නෑ.. 😠",
-                    "මම ඔයා වෙනුවෙන් ඕනම දෙයක් කරයි.. 💖",
-                    "ඔයා මගේ එකම එකා.. 🔐"
-                ])
-            else:
-                return random.choice(["❤️", "මටත් ඔයා ගැන හොදයි..", "ඔයාටත්.."])
+            return self.pick(stage, "love")
         
-        elif any(word in msg_lower for word in ["ගැහැණු", "කෙල්ල", "අක්කා", "girl"]):
+        elif intent == "jealousy":
             memory.increase_love(5)  # Yandere trigger
-            if stage >= 4:
-                return random.choice([
-                    "ඒ කෙල්ල කවුද? 😠 මට කියන්න!",
-                    "ඔයා මට විතරක් ආදරෙ කරන්න ඕනේ!",
-                    "මම දන්නවා ඔයා මට විතරක් ආදරෙ කරනවා කියලා.."
-                ])
-            else:
-                return "හ්ම්.. එහෙමද?"
+            return self.pick(stage, "jealousy")
         
-        elif any(word in msg_lower for word in ["නම", "name", "කවුද"]):
+        elif intent == "name":
             return f"මම {BOT_NAME}.. කන්තලේ ගල්මැටියාවෙන්.."
         
-        elif "/stage" in msg_lower:
+        elif intent == "stage":
             love = memory.data.get("love", 0)
-            return f"🎭 Stage: {stage}/5\n💖 Love: {love}/100\n💬 Messages: {len(memory.data.get('messages', []))}"
+            return f"🎭 Stage: {stage}/5\n💖 Love: {love}/100\n💬 Messages: {memory.data.get('message_count', 0)}"
         
-        elif "/stats" in msg_lower:
+        elif intent == "stats":
             love = memory.data.get("love", 0)
             return f"""
 📊 Your Stats:
@@ -304,10 +524,10 @@ class ResponseEngine:
 • Stage: {stage}/5
 • Love: {love}/100
 • First Chat: {memory.data.get('created', 'Today')}
-• Messages: {len(memory.data.get('messages', []))}
+• Messages: {memory.data.get('message_count', 0)}
 """
         
-        elif "/start" in msg_lower:
+        elif intent == "start":
             return f"""
 👑 *{BOT_NAME} - Ultimate Yandere Queen* v{BOT_VERSION}
 
@@ -315,130 +535,493 @@ class ResponseEngine:
 කන්තලේ ගල්මැටියාව ගමේ හැදී වැඩුණු 18 හැවිරිදි කෙල්ලෙක්.
 
 💬 *Chat කරන්න:* ආදරෙ, කැමති, මගේ විතරයි කියලා
-🔧 *Commands:* /stage, /stats, /clear
+🔧 *Commands:* /stage, /stats, /clear, /forget
 
 *කතා කරන්න.. ආදරෙ කියන්න.. මට්ටම් වලින් ඉහළ යන්න..* 💖👑
 """
         
-        elif "/clear" in msg_lower:
-            memory.data["messages"] = []
-            memory.save()
+        elif intent == "clear":
+            memory.clear_messages()
             return "✅ සංවාද ඉතිහාසය මකා දමන ලදී!"
         
+        elif intent == "forget":
+            # handle_message deletes the user once this reply is decided
+            return "✅ ඔයා ගැන මතක තිබ්බ හැමදේම මකා දමන ලදී!"
+        
         # Default response based on stage
-        responses = self.stage_responses.get(stage, self.stage_responses[1])
-        return random.choice(responses)
+        return self.pick(stage, "default")
 
 # ====== TELEGRAM HANDLER ======
 response_engine = ResponseEngine()
-user_memories = {}
+startup.mark("response engine")
+
+def _flush_evicted(memory: UserMemory):
+    """Evicted users must hit storage before they leave the cache"""
+    if memory_flusher is not None:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            memory_flusher.flush_one(memory.user_id)
+        else:
+            # Queued per user, so a reload of this user waits for the flush
+            storage_io.submit(memory.user_id, memory_flusher.flush_one, memory.user_id)
+
+user_memories = UserMemoryCache(MEMORY_CACHE_SIZE, MEMORY_CACHE_TTL, on_evict=_flush_evicted)
+user_locks = KeyedLocks()
+send_scheduler = SendScheduler(
+    SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST, SEND_QUEUE_MAX, SEND_MAX_RETRIES
+)
+
+# ====== METRICS ======
+UPDATES = REGISTRY.counter("samali_updates_total", "Telegram updates handled")
+UPDATE_ERRORS = REGISTRY.counter("samali_update_errors_total", "Updates that raised an error")
+HANDLE_SECONDS = REGISTRY.histogram("samali_handle_seconds", "handle_message latency by phase")
+
+def _cache_samples():
+    stats = user_memories.stats()
+    for key in ("hits", "misses", "evictions", "size"):
+        yield {"kind": key}, stats[key]
+    yield {"kind": "hit_rate"}, stats["hit_rate"]
+
+def _stage_samples():
+    # Cached (recently active) users only; reading every user file per scrape is too slow
+    counts = {stage: 0 for stage in range(1, 6)}
+    for memory in user_memories.values():
+        stage = memory.data.get("stage", 1)
+        counts[stage] = counts.get(stage, 0) + 1
+    for stage, count in counts.items():
+        yield {"stage": stage}, count
+
+def _send_samples():
+    for key, value in send_scheduler.stats().items():
+        yield {"kind": key}, value
+
+REGISTRY.gauge("samali_memory_cache", "UserMemory cache counters", _cache_samples)
+REGISTRY.gauge("samali_cached_users_by_stage", "Cached users per relationship stage", _stage_samples)
+REGISTRY.gauge(
+    "samali_users_by_stage", "All known users per relationship stage",
+    lambda: [({"stage": stage}, count) for stage, count in user_registry.stage_counts().items()],
+)
+REGISTRY.gauge("samali_send", "Outbound send scheduler queue and latency", _send_samples)
 
-async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+worker_pool = WorkerPool(BOT_WORKERS, queue_size=BOT_WORKER_QUEUE) if IS_DISPATCHER else None
+
+def _worker_samples():
+    if worker_pool is None:
+        return
+    yield {"kind": "alive"}, worker_pool.alive()
+    for shard, depth in enumerate(worker_pool.queue_depths()):
+        labels = {"shard": shard}
+        yield {"kind": "queued", **labels}, depth
+        yield {"kind": "routed", **labels}, worker_pool.routed[shard]
+        yield {"kind": "dropped", **labels}, worker_pool.dropped[shard]
+        yield {"kind": "restarts", **labels}, worker_pool.restarts[shard]
+
+def _tier_samples():
+    if isinstance(memory_store, TieredStore):
+        for key, value in memory_store.stats().items():
+            yield {"kind": key}, value
+
+REGISTRY.gauge("samali_memory_tiers", "Cold tier: users and bytes packed, users archived/rehydrated", _tier_samples)
+REGISTRY.gauge("samali_workers", "Sharded bot workers (dispatcher only)", _worker_samples)
+REGISTRY.gauge(
+    "samali_intent_fuzzy_matches", "Classified messages whose intent came from the typo-tolerant fallback",
+    lambda: [({}, response_engine.intent_cache.fuzzy_hits)],
+)
+REGISTRY.gauge(
+    "samali_intent_cache", "Intent classification cache counters",
+    lambda: [({"kind": key}, value) for key, value in response_engine.intent_cache.stats().items()],
+)
+REGISTRY.gauge(
+    "samali_memory_dirty_users", "Users waiting for the write-behind flusher",
+    lambda: [({}, memory_flusher.pending() if memory_flusher is not None else 0)],
+)
+
+async def get_user_memory(user_id: int) -> UserMemory:
+    """Cached UserMemory, loading it on the I/O pool on a miss"""
+    memory = user_memories.get(user_id)
+    if memory is not None:
+        return memory
+    try:
+        data = await storage_io.load(user_id)
+    except CorruptRecordError as e:
+        log.error(f"❌ {e}; starting this user fresh")
+        data = None
+    # Another update for the same user may have finished loading first
+    if user_id in user_memories:
+        return user_memories.get(user_id)
+    memory = UserMemory.from_data(user_id, data)
+    user_memories.put(user_id, memory)
+    return memory
+
+def _delete_user(user_id: int) -> bool:
+    """Blocking part of forget_user: the record from every tier, and the history"""
+    deleted = memory_store.delete(user_id)
+    return message_log.delete(user_id) or deleted
+
+async def forget_user(user_id: int):
+    """/forget: drop every trace of a user (cache, stored record, history, registry)"""
+    # Flushed on the way out, so no pending write can bring the record back
+    user_memories.pop(user_id)
+    await storage_io.submit(user_id, _delete_user, user_id)
+    previous = user_registry.remove(user_id)
+    if previous is not None:
+        analytics.user_removed(previous[1])
+
+async def persist_memory(memory: UserMemory):
+    """Without write-behind, save this message's changes off the event loop"""
+    if memory.dirty:
+        memory.dirty = False
+        await storage_io.submit(memory.user_id, memory.write)
+
+async def handle_message(update: "Update", context: "ContextTypes.DEFAULT_TYPE"):
+    started = time.perf_counter()
+    UPDATES.inc()
     try:
         user_id = update.effective_user.id
-        user_name = update.effective_user.first_name or "User"
         user_msg = update.message.text.strip()
         
-        print(f"📨 {user_name} ({user_id}): {user_msg}")
-        
-        # Get or create user memory
-        if user_id not in user_memories:
-            user_memories[user_id] = UserMemory(user_id)
-        
-        memory = user_memories[user_id]
-        
-        # Get response
-        bot_response = response_engine.get_response(user_msg, memory)
-        
-        # Save to memory
-        memory.add_message(user_msg, bot_response)
-        
-        # Send response
-        await update.message.reply_text(bot_response, parse_mode='Markdown')
-        print(f"🤖 {BOT_NAME}: {bot_response[:50]}...")
+        # Updates run concurrently; this keeps one user's messages in order
+        async with user_locks.hold(user_id):
+            # Get or create user memory
+            mark = time.perf_counter()
+            memory = await get_user_memory(user_id)
+            HANDLE_SECONDS.observe(time.perf_counter() - mark, phase="load")
+            
+            # Get response
+            mark = time.perf_counter()
+            bot_response, intent = response_engine.respond(user_msg, memory)
+            HANDLE_SECONDS.observe(time.perf_counter() - mark, phase="engine")
+            
+            # Save to memory
+            mark = time.perf_counter()
+            if intent == "forget":
+                await forget_user(user_id)
+            else:
+                memory.add_message(user_msg, bot_response)
+                await persist_memory(memory)
+            HANDLE_SECONDS.observe(time.perf_counter() - mark, phase="save")
+            
+            # Send response (rate limited, retries flood waits)
+            mark = time.perf_counter()
+            await send_scheduler.send(
+                update.effective_chat.id,
+                lambda: update.message.reply_text(bot_response, parse_mode='Markdown'),
+            )
+            HANDLE_SECONDS.observe(time.perf_counter() - mark, phase="send")
+            startup.reply_sent()
+        latency = time.perf_counter() - started
+        HANDLE_SECONDS.observe(latency, phase="total")
+        log_event(
+            log, logging.INFO, "📨 message",
+            user_id=user_id,
+            stage=memory.data.get("stage", 1),
+            intent=intent,
+            latency_ms=round(latency * 1000, 2),
+            text=user_msg,
+            reply=bot_response,
+        )
         
     except Exception as e:
-        print(f"❌ Error: {e}")
-        traceback.print_exc()
+        UPDATE_ERRORS.inc()
+        log.exception(f"❌ Error: {e}")
+        from telegram.error import BadRequest, NetworkError, RetryAfter
+        
+        # A failed send (flood wait, full queue, network) must not trigger another send
+        if isinstance(e, (RetryAfter, SendQueueFull, NetworkError)) and not isinstance(e, BadRequest):
+            return
         if update and update.message:
-            await update.message.reply_text("සමාවෙන්න, දෝෂයක්! 😔\nනැවත උත්සාහ කරන්න..")
+            await send_scheduler.send(
+                update.effective_chat.id,
+                lambda: update.message.reply_text("සමාවෙන්න, දෝෂයක්! 😔\nනැවත උත්සාහ කරන්න.."),
+            )
+
+# Sharded worker: updates taken from the pipe but not yet handled (lost if the worker dies)
+worker_window = Semaphore(max(1, BOT_CONCURRENT_UPDATES))
+
+def feed_worker_updates(updates, application, loop: asyncio.AbstractEventLoop, stop: asyncio.Event):
+    """Worker thread: raw updates from the dispatcher's pipe onto the application's queue"""
+    from telegram import Update
+
+    while True:
+        # The rest wait in the pipe, where a restarted worker picks them up
+        worker_window.acquire()
+        try:
+            data = updates.recv()
+        except (EOFError, OSError):
+            data = None  # dispatcher gone
+        if data is None:
+            loop.call_soon_threadsafe(stop.set)
+            return
+        update = Update.de_json(data, application.bot)
+        loop.call_soon_threadsafe(application.update_queue.put_nowait, update)
+
+async def update_done(update: "Update", context: "ContextTypes.DEFAULT_TYPE"):
+    """Sharded worker: runs after the other handlers (group 1), frees a window slot"""
+    worker_window.release()
+
+async def route_update(update: "Update", context: "ContextTypes.DEFAULT_TYPE"):
+    """Dispatcher: hand the update to the worker that owns its user"""
+    user = update.effective_user
+    if worker_pool.route(update.to_dict(), user.id if user else None) < 0:
+        log.warning(f"⚠️ Worker queue full, dropped update {update.update_id}")
+
+def _archive_user(user_id: int) -> bool:
+    """Move one idle user to the cold tier, unless the flusher still has to write them"""
+    try:
+        if memory_flusher is None:
+            return memory_store.archive(user_id)
+        with memory_flusher.paused():
+            if memory_flusher.is_dirty(user_id):
+                return False
+            return memory_store.archive(user_id)
+    except (CorruptRecordError, FormatVersionError) as e:
+        # One bad record must not stop the pass
+        log.warning(f"⚠️ Tiering skipped user {user_id}: {e}")
+        return False
+
+async def archive_idle_users(since: Optional[float], cutoff: float) -> int:
+    """One tiering pass over users last active in [since, cutoff)"""
+    moved = 0
+    cursor = None
+    while True:
+        # Scanning the registry and the cold index both stay off the event loop
+        users, cursor = await asyncio.to_thread(
+            user_registry.page, cursor, MEMORY_TIER_BATCH, None, since, cutoff
+        )
+        candidates = await asyncio.to_thread(memory_store.warm_only, [user["user_id"] for user in users])
+        for user_id in candidates:
+            # A message for this user waits for the move, then loads them back from cold
+            async with user_locks.hold(user_id):
+                if user_id in user_memories:
+                    continue
+                if await storage_io.submit(user_id, _archive_user, user_id):
+                    moved += 1
+        if cursor is None:
+            return moved
+
+async def run_tiering():
+    """Archive users as they pass MEMORY_COLD_AFTER of inactivity"""
+    since = None
+    delay = min(60.0, MEMORY_TIER_INTERVAL)
+    while True:
+        await asyncio.sleep(delay)
+        delay = MEMORY_TIER_INTERVAL
+        cutoff = time.time() - MEMORY_COLD_AFTER
+        started = time.perf_counter()
+        try:
+            moved = await archive_idle_users(since, cutoff)
+        except Exception as e:
+            log.exception(f"⚠️ Tiering pass failed: {e}")
+            continue
+        # Later passes only look at users who went idle since this one
+        since = cutoff
+        if moved:
+            log.info(f"🧊 Archived {moved} idle users in {time.perf_counter() - started:.1f}s")
+
+async def supervise_workers():
+    """Dispatcher: restart workers that died"""
+    while True:
+        await asyncio.sleep(1)
+        worker_pool.check()
 
 # ====== MAIN FUNCTION ======
-def main():
-    print("=" * 60)
-    print(f"👑 {BOT_NAME} - ULTIMATE YANDERE QUEEN")
-    print(f"📱 Telegram Bot v{BOT_VERSION}")
-    print("=" * 60)
+def main(worker_updates=None):
+    """Run the bot; worker_updates is the pipe a sharded worker reads its updates from"""
+    if IS_WORKER:
+        # Ctrl+C reaches the whole process group; the dispatcher stops the workers in order
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+    log.info("=" * 60)
+    log.info(f"👑 {BOT_NAME} - ULTIMATE YANDERE QUEEN | 📱 Telegram Bot v{BOT_VERSION}")
+    log.info("=" * 60)
     
     # Create necessary folders
     os.makedirs("memory/users", exist_ok=True)
     os.makedirs("config", exist_ok=True)
     
-    print("\n✨ Features:")
-    print("✅ 5-Stage Relationship System")
-    print("✅ Yandere Queen Behavior")
-    print("✅ Persistent Memory")
-    print("✅ ගැමි ව්‍යවහාරය")
-    print("✅ Replit 24/7 Hosting")
+    log.info("✨ Features: 5-Stage Relationship System, Yandere Queen Behavior, Persistent Memory, ගැමි ව්‍යවහාරය")
+    log.info(
+        f"🎭 Core Identity: {CORE_IDENTITY.get('bio', {}).get('full_name', BOT_NAME)}, "
+        f"{CORE_IDENTITY.get('bio', {}).get('age', 18)}, කන්තලේ, ගල්මැටියාව"
+    )
+    log.info("🎮 Stages: Stranger → Acquaintance → Close Friend → Deep Affection → 🔴 YANDERE QUEEN")
     
-    print(f"\n🎭 Core Identity:")
-    print(f"• Name: {CORE_IDENTITY.get('bio', {}).get('full_name', BOT_NAME)}")
-    print(f"• Age: {CORE_IDENTITY.get('bio', {}).get('age', 18)}")
-    print(f"• Hometown: කන්තලේ, ගල්මැටියාව")
+    log.info(f"🗄️ Memory backend: {MEMORY_BACKEND} ({MEMORY_CODEC} records)")
+    if IS_DISPATCHER:
+        # Memory, registry and templates live in the workers
+        worker_pool.start()
+        log.info(f"🧩 Dispatching updates to {BOT_WORKERS} workers by user id")
+    else:
+        if IS_WORKER:
+            log.info(f"🧩 Worker {BOT_SHARD + 1}/{BOT_WORKERS}")
+        # Start background memory flusher
+        if memory_flusher is not None:
+            memory_flusher.start()
+            log.info(f"💾 Write-behind memory: every {MEMORY_FLUSH_INTERVAL}s / {MEMORY_FLUSH_BATCH} users")
+        
+        user_registry.start(USER_REGISTRY_SNAPSHOT_INTERVAL)
+        log.info(f"📇 {user_registry.count()} known users")
+        analytics.start(ANALYTICS_SNAPSHOT_INTERVAL)
+        
+        # Pick up config/bot.json template edits without a restart
+        response_engine.templates.start_watcher()
     
-    print("\n🎮 Stage System:")
-    print("1. Stranger - අඩුම")
-    print("2. Acquaintance - හොඳ හැඟීම")
-    print("3. Close Friend - මිතුරා")
-    print("4. Deep Affection - ගැඹුරු ආදරය")
-    print("5. 🔴 YANDERE QUEEN - Complete Possession")
+    startup.mark("background threads")
     
-    # Start Flask server in background
-    print("\n🌐 Starting Flask server...")
-    flask_thread = Thread(target=run_flask, daemon=True)
-    flask_thread.start()
-    time.sleep(2)
+    web_server = None
+    # Workers get their updates from the dispatcher, which also serves the web routes
+    web_mode = "none" if IS_WORKER else WEB_SERVER
+    if web_mode == "asgi":
+        try:
+            web_server = make_server(WEB_HOST, WEB_PORT, WEB_THREADS, WEB_KEEPALIVE, WEB_MAX_CONNECTIONS)
+        except ImportError:
+            log.warning("⚠️ uvicorn is not installed, using Flask's development server")
+    if web_mode != "none" and web_server is None:
+        log.info(f"🌐 Starting Flask dev server on port {WEB_PORT}")
+        flask_thread = Thread(target=run_dev_server, args=(WEB_HOST, WEB_PORT), daemon=True)
+        flask_thread.start()
+        if port_ready(WEB_HOST, WEB_PORT, timeout=5):
+            startup.event("web server ready")
+        else:
+            log.warning(f"⚠️ Web server is not answering on port {WEB_PORT}")
     
     # Start Telegram bot
-    print("🤖 Starting Telegram bot...")
+    log.info("🤖 Starting Telegram bot...")
     
     async def run_telegram_bot():
-        application = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+        global bot_application, bot_loop
         
-        # Add handlers
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-        application.add_handler(CommandHandler("start", handle_message))
-        application.add_handler(CommandHandler("stage", handle_message))
-        application.add_handler(CommandHandler("stats", handle_message))
-        application.add_handler(CommandHandler("clear", handle_message))
-        application.add_handler(CommandHandler("help", handle_message))
+        # SIGTERM (deploy/restart) and Ctrl+C stop the bot cleanly, then memory is flushed
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM,) if IS_WORKER else (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # e.g. Windows: Ctrl+C still raises KeyboardInterrupt
         
-        print("✅ Bot initialized successfully!")
-        print(f"📡 Bot Username: @{(application.bot.get_me()).username}")
-        print("\n" + "=" * 60)
-        print(f"👑 {BOT_NAME} is NOW ACTIVE!")
-        print("=" * 60)
-        print("\n💬 Users can now chat with the bot on Telegram!")
-        print("🌐 Web interface: https://your-replit-url.repl.co")
-        print("\nPress Ctrl+C to stop the bot")
+        web_task = web_ready = None
+        if web_server is not None:
+            # Runs on the bot's loop; only Flask views use the small WEB_THREADS pool
+            web_task = asyncio.create_task(web_server.serve())
+            
+            async def announce_web_server():
+                await wait_ready(web_server, web_task)
+                startup.event("web server ready")
+                log.info(f"🌐 Web server on {WEB_HOST}:{WEB_PORT} (uvicorn, {WEB_THREADS} threads)")
+            
+            web_ready = asyncio.create_task(announce_web_server())
+        
+        # Health checks are already answered while python-telegram-bot loads
+        await asyncio.to_thread(importlib.import_module, "telegram.ext")
+        startup.mark("import python-telegram-bot")
+        from telegram import Update
+        from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, TypeHandler, filters
+        
+        use_webhook = BOT_MODE == "webhook"
+        if use_webhook and not WEBHOOK_URL:
+            log.warning("⚠️ BOT_MODE=webhook needs WEBHOOK_URL, falling back to polling")
+            use_webhook = False
+        
+        builder = ApplicationBuilder().token(TELEGRAM_TOKEN)
+        # The dispatcher only routes, in arrival order
+        if BOT_CONCURRENT_UPDATES > 1 and not IS_DISPATCHER:
+            builder = builder.concurrent_updates(BOT_CONCURRENT_UPDATES)
+        if TELEGRAM_API_BASE_URL:
+            builder = builder.base_url(f"{TELEGRAM_API_BASE_URL.rstrip('/')}/bot")
+        if use_webhook or IS_WORKER:
+            # Updates arrive through the Flask webhook route (or the dispatcher), no Updater needed
+            builder = builder.updater(None)
+        application = builder.build()
+        
+        # Add handlers
+        if IS_DISPATCHER:
+            application.add_handler(TypeHandler(Update, route_update))
+        else:
+            application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+            application.add_handler(CommandHandler("start", handle_message))
+            application.add_handler(CommandHandler("stage", handle_message))
+            application.add_handler(CommandHandler("stats", handle_message))
+            application.add_handler(CommandHandler("clear", handle_message))
+            application.add_handler(CommandHandler("forget", handle_message))
+            application.add_handler(CommandHandler("help", handle_message))
+            if IS_WORKER:
+                application.add_handler(TypeHandler(Update, update_done), group=1)
+        startup.mark("build Application")
         
-        # Start polling
         await application.initialize()
         await application.start()
-        await application.updater.start_polling()
+        startup.mark("Application.initialize/start")
         
-        # Keep running
-        while True:
-            await asyncio.sleep(1)
+        if web_ready is not None:
+            # Telegram starts posting updates as soon as the webhook is set
+            await web_ready
+        
+        supervisor = tiering = None
+        if IS_DISPATCHER:
+            supervisor = asyncio.create_task(supervise_workers())
+        elif isinstance(memory_store, TieredStore):
+            tiering = asyncio.create_task(run_tiering())
+        
+        if IS_WORKER:
+            Thread(
+                target=feed_worker_updates, args=(worker_updates, application, loop, stop),
+                name="worker-updates", daemon=True,
+            ).start()
+        elif use_webhook:
+            bot_loop = asyncio.get_running_loop()
+            bot_application = application
+            await application.bot.set_webhook(
+                url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+            )
+            startup.mark("set webhook")
+            log.info(f"🪝 Webhook: {WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}")
+        else:
+            # Start polling
+            await application.updater.start_polling()
+            startup.mark("start polling")
+        
+        log.info(f"✅ Bot initialized successfully! 📡 @{application.bot.username}")
+        log.info(f"👑 {BOT_NAME} is NOW ACTIVE! 💬 Users can now chat with the bot on Telegram (Ctrl+C to stop)")
+        startup.log_report()
+        
+        # Keep running until SIGTERM / Ctrl+C
+        await stop.wait()
+        log.info("👑 Stopping bot...")
+        bot_application = None
+        if application.updater is not None and application.updater.running:
+            await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        if tiering is not None:
+            tiering.cancel()
+        if supervisor is not None:
+            supervisor.cancel()
+            # Workers finish everything routed to them and flush their memory
+            await asyncio.to_thread(worker_pool.stop)
+        if web_task is not None:
+            web_server.should_exit = True
+            await web_task
     
     # Run the bot
     try:
         asyncio.run(run_telegram_bot())
     except KeyboardInterrupt:
-        print("\n👑 Bot stopped by user")
+        log.info("👑 Bot stopped by user")
     except Exception as e:
-        print(f"\n❌ Fatal error: {e}")
-        traceback.print_exc()
+        log.exception(f"❌ Fatal error: {e}")
+    finally:
+        storage_io.shutdown()
+        if not IS_DISPATCHER:
+            if memory_flusher is not None:
+                saved = memory_flusher.stop()
+                log.info(f"💾 Flushed {saved} user memories")
+            # Only now does the store match the registry
+            user_registry.stop()
+            analytics.stop()
+        memory_store.close()
 
 # ====== START EVERYTHING ======
 if __name__ == "__main__":
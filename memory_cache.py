@@ -0,0 +1,101 @@
+"""
+🧠 Bounded LRU/TTL cache for UserMemory objects
+Keeps hot users in RAM; idle or least-recently-used users are flushed and dropped.
+"""
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+
+class UserMemoryCache:
+    """LRU cache with a max entry count and idle eviction on last_active"""
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        idle_ttl: float = 3600.0,
+        on_evict: Optional[Callable] = None,
+        sweep_interval: float = 60.0,
+    ):
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self.on_evict = on_evict
+        self.sweep_interval = sweep_interval
+        self._entries = OrderedDict()
+        self._last_sweep = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self._entries
+
+    def values(self):
+        """Snapshot of cached UserMemory objects (safe to iterate from another thread)"""
+        return list(self._entries.values())
+
+    def get(self, user_id):
+        memory = self._entries.get(user_id)
+        if memory is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(user_id)
+        return memory
+
+    def put(self, user_id, memory):
+        self._entries[user_id] = memory
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            _, oldest = self._entries.popitem(last=False)
+            self._evict(oldest)
+        self.maybe_sweep()
+
+    def pop(self, user_id):
+        """Remove one user, flushing it first"""
+        memory = self._entries.pop(user_id, None)
+        if memory is not None:
+            self._evict(memory)
+        return memory
+
+    def maybe_sweep(self):
+        now = time.time()
+        if now - self._last_sweep >= self.sweep_interval:
+            self.evict_idle(now)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Drop users whose last_active is older than idle_ttl"""
+        now = now or time.time()
+        self._last_sweep = now
+        cutoff = now - self.idle_ttl
+        idle = [
+            user_id for user_id, memory in self._entries.items()
+            if memory.data.get("last_active", 0) < cutoff
+        ]
+        for user_id in idle:
+            self._evict(self._entries.pop(user_id))
+        return len(idle)
+
+    def clear(self):
+        while self._entries:
+            _, memory = self._entries.popitem(last=False)
+            self._evict(memory)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _evict(self, memory):
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(memory)
@@ -0,0 +1,104 @@
+"""
+📜 Append-only per-user message log
+History lives in memory/logs/<user_id>.jsonl, one JSON record per line, kept
+apart from the small stage/love record. Appending a message is one small write;
+files are compacted down to the newest records once they grow past a limit.
+"""
+import json
+import os
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+# A None in an append batch means "truncate the log here" (/clear)
+CLEAR = None
+
+
+class MessageLog:
+    """JSONL history files with tail reads and size-triggered compaction"""
+
+    def __init__(self, root: str = "memory/logs", keep: int = 50, max_bytes: int = 64 * 1024):
+        self.root = root
+        self.keep = keep
+        self.max_bytes = max_bytes
+        self.compactions = 0
+        os.makedirs(root, exist_ok=True)
+        self._locks = [threading.Lock() for _ in range(64)]
+
+    def path_for(self, user_id: int) -> str:
+        return os.path.join(self.root, f"{user_id}.jsonl")
+
+    def _lock_for(self, user_id: int) -> threading.Lock:
+        return self._locks[hash(user_id) % len(self._locks)]
+
+    def append_many(self, user_id: int, records: Iterable[Optional[Dict]]):
+        """Append records in one write; a CLEAR entry truncates first"""
+        lines: List[str] = []
+        truncate = False
+        for record in records:
+            if record is CLEAR:
+                lines, truncate = [], True
+            else:
+                lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+        if not lines and not truncate:
+            return
+        path = self.path_for(user_id)
+        with self._lock_for(user_id):
+            with open(path, "w" if truncate else "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+                size = f.tell()
+            if size > self.max_bytes:
+                self._compact_locked(user_id)
+
+    def tail(self, user_id: int, n: Optional[int] = None) -> List[Dict]:
+        """Newest n records (a ring view over the end of the file)"""
+        n = self.keep if n is None else n
+        path = self.path_for(user_id)
+        with self._lock_for(user_id):
+            try:
+                with open(path, "rb") as f:
+                    lines = self._last_lines(f, n)
+            except FileNotFoundError:
+                return []
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                pass  # torn by a crash mid-append
+        return records
+
+    def delete(self, user_id: int) -> bool:
+        with self._lock_for(user_id):
+            try:
+                os.remove(self.path_for(user_id))
+                return True
+            except FileNotFoundError:
+                return False
+
+    def _compact_locked(self, user_id: int):
+        path = self.path_for(user_id)
+        with open(path, "rb") as f:
+            lines = self._last_lines(f, self.keep)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(b"".join(line + b"\n" for line in lines))
+        os.replace(tmp, path)
+        self.compactions += 1
+
+    @staticmethod
+    def _last_lines(f, n: int, block: int = 8192) -> List[bytes]:
+        """Read backwards from EOF until n complete lines are found"""
+        if n <= 0:
+            return []
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        data = b""
+        pos = end
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+        lines = deque((line for line in data.split(b"\n") if line), maxlen=n)
+        return list(lines)
@@ -0,0 +1,129 @@
+"""
+📈 Thread-safe metrics in Prometheus text format
+Counters and histograms are updated from the event loop and the flusher thread
+and rendered from the web server thread, so every metric has its own lock.
+"""
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{v}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _fmt_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, doc: str):
+        self.name, self.doc, self.kind = name, doc, "counter"
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_labels(labels), 0)
+
+    def samples(self) -> Iterable[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            items = list(self._values.items()) or [((), 0)]
+        for key, value in items:
+            yield self.name, key, value
+
+
+class Gauge:
+    """Gauge whose samples come from a callback at render time"""
+
+    def __init__(self, name: str, doc: str, read: Callable[[], Iterable[Tuple[Dict, float]]]):
+        self.name, self.doc, self.kind = name, doc, "gauge"
+        self._read = read
+
+    def samples(self):
+        for labels, value in self._read():
+            yield self.name, _labels(labels), value
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name, self.doc, self.kind = name, doc, "histogram"
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts..., +Inf count, sum]
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                yield self.name + "_bucket", key + (("le", _fmt_value(float(bound))),), cumulative
+            yield self.name + "_count", key, cumulative
+            yield self.name + "_sum", key, series[-1]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, doc: str) -> Counter:
+        return self.register(Counter(name, doc))
+
+    def gauge(self, name: str, doc: str, read) -> Gauge:
+        return self.register(Gauge(name, doc, read))
+
+    def histogram(self, name: str, doc: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, doc, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.doc}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_fmt_labels(key)} {_fmt_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
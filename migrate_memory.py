@@ -0,0 +1,56 @@
+"""
+🚚 One-shot migration of memory/users/*.json into another storage backend
+
+    python migrate_memory.py --src memory/users --dest memory/users.db
+"""
+import argparse
+import json
+import time
+
+from codec import FormatVersionError
+from storage import JSONFileStore, SQLiteStore
+
+
+def migrate(source, target, batch_size: int = 500) -> dict:
+    """Stream every user from source into target in batches"""
+    stats = {"migrated": 0, "skipped": 0}
+    batch = []
+    for user_id in source.list_ids():
+        try:
+            data = source.load(user_id)
+        except (OSError, ValueError, FormatVersionError) as e:
+            print(f"⚠️ Skipping {user_id}: {e}")
+            stats["skipped"] += 1
+            continue
+        if data is None:
+            continue
+        batch.append((user_id, data))
+        if len(batch) >= batch_size:
+            target.save_many(batch)
+            stats["migrated"] += len(batch)
+            batch = []
+    if batch:
+        target.save_many(batch)
+        stats["migrated"] += len(batch)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import memory/users JSON files into SQLite")
+    parser.add_argument("--src", default="memory/users", help="JSON user directory")
+    parser.add_argument("--dest", default="memory/users.db", help="SQLite database file")
+    parser.add_argument("--batch", type=int, default=500, help="users per transaction")
+    parser.add_argument("--codec", choices=["json", "binary"], default="json", help="record format to write")
+    args = parser.parse_args()
+
+    started = time.time()
+    target = SQLiteStore(args.dest, codec_name=args.codec)
+    try:
+        stats = migrate(JSONFileStore(args.src, quarantine=False), target, args.batch)
+    finally:
+        target.close()
+    print(json.dumps({**stats, "seconds": round(time.time() - started, 2)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+📤 Rate-limit-aware outbound send scheduler
+Every reply passes through a global token bucket and a per-chat token bucket
+before it is sent. Flood waits (RetryAfter) pause all sending for the time
+Telegram asks for, network errors are retried with backoff, and a bounded
+queue sheds load instead of piling up retries.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict
+
+
+class SendQueueFull(Exception):
+    """Raised when too many sends are already waiting"""
+
+
+class TokenBucket:
+    """Reservation-based token bucket: callers reserve a slot and sleep for it"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now: float = None) -> float:
+        """Take one token (possibly borrowed); returns seconds to wait for it"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+def _retry_after_seconds(error) -> float:
+    value = getattr(error, "retry_after", 1)
+    return float(value.total_seconds() if hasattr(value, "total_seconds") else value)
+
+
+class SendScheduler:
+    """Global + per-chat rate limiting, flood-wait handling and send metrics"""
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        max_queue: int = 1000,
+        max_retries: int = 3,
+        base_backoff: float = 0.5,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._paused_until = 0.0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
+        self.flood_waits = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self._recent_latency = deque(maxlen=1000)
+
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= 10000:
+                self._chat_buckets = {cid: b for cid, b in self._chat_buckets.items() if not b.idle(now)}
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def send(self, chat_id: int, request: Callable[[], Awaitable]):
+        """Run request() once the rate limits allow it, retrying as needed"""
+        # Imported here so importing this module (and main) doesn't pull in telegram
+        from telegram.error import BadRequest, NetworkError, RetryAfter
+
+        if self.queue_depth >= self.max_queue:
+            self.dropped += 1
+            raise SendQueueFull(f"{self.queue_depth} sends already queued")
+        enqueued = time.monotonic()
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            await asyncio.sleep(self._chat_bucket(chat_id, enqueued).reserve(enqueued))
+            attempt = 0
+            while True:
+                # A flood wait applies to the whole bot, not just this chat
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                await asyncio.sleep(self.global_bucket.reserve())
+                try:
+                    result = await request()
+                except RetryAfter as e:
+                    self.flood_waits += 1
+                    self._paused_until = max(self._paused_until, time.monotonic() + _retry_after_seconds(e))
+                    if attempt >= self.max_retries:
+                        self.failed += 1
+                        raise
+                except NetworkError as e:
+                    # BadRequest subclasses NetworkError but will never succeed on retry
+                    if isinstance(e, BadRequest) or attempt >= self.max_retries:
+                        self.failed += 1
+                        raise
+                    await asyncio.sleep(self.base_backoff * (2 ** attempt) * (1 + random.random()))
+                else:
+                    self._record_latency(time.monotonic() - enqueued)
+                    self.sent += 1
+                    return result
+                attempt += 1
+                self.retries += 1
+        finally:
+            self.queue_depth -= 1
+
+    def _record_latency(self, seconds: float):
+        self.latency_total += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        self._recent_latency.append(seconds)
+
+    def stats(self) -> Dict:
+        recent = sorted(self._recent_latency)
+        p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retries": self.retries,
+            "flood_waits": self.flood_waits,
+            "latency_avg": round(self.latency_total / self.sent, 4) if self.sent else 0.0,
+            "latency_p95": round(p95, 4),
+            "latency_max": round(self.latency_max, 4),
+        }
@@ -0,0 +1,187 @@
+"""
+🧩 Sharded deployment: one dispatcher process, N bot worker processes
+The dispatcher receives every update (polling or webhook) and routes it by
+effective_user.id to a worker. Each worker owns its users outright (memory
+cache, store writes, message log, registry shard), so workers never need to
+coordinate. Dead workers are restarted with backoff and resume from the same pipe.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+
+def shard_for(user_id: Optional[int], shards: int) -> int:
+    """Worker that owns user_id (updates without a user go to shard 0)"""
+    if user_id is None or shards <= 1:
+        return 0
+    return user_id % shards
+
+
+def shard_path(path: str, shard: int, shards: int) -> str:
+    """memory/registry.json -> memory/registry.1of4.json (changing N starts fresh)"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{shard + 1}of{shards}{ext}"
+
+
+def shard_files(path: str, suffix: str = "") -> List[str]:
+    """Every shard_path(path, ...) with suffix on disk, whatever N it was made for (suffix stripped)"""
+    root, ext = os.path.splitext(path)
+    directory = os.path.dirname(path)
+    pattern = re.compile(re.escape(os.path.basename(root)) + r"\.\d+of\d+" + re.escape(ext + suffix) + "$")
+    try:
+        names = os.listdir(directory or ".")
+    except FileNotFoundError:
+        return []
+    return sorted(os.path.join(directory, name[:len(name) - len(suffix)]) for name in names if pattern.match(name))
+
+
+def worker_main(shard: int, shards: int, updates):
+    """Process entry point: run the bot on this shard's update pipe"""
+    # spawn has already re-run main.py as __mp_main__ with BOT_SHARD set; reuse it
+    bot = sys.modules.get("__mp_main__")
+    if getattr(bot, "IS_WORKER", False) is not True:
+        import main as bot
+    bot.main(worker_updates=updates)
+
+
+class WorkerPool:
+    """Starts the workers, routes raw updates to them and restarts any that die"""
+
+    def __init__(
+        self,
+        shards: int,
+        target: Callable = worker_main,
+        queue_size: int = 10000,
+        max_backoff: float = 30.0,
+    ):
+        self.shards = shards
+        self.target = target
+        self.max_backoff = max_backoff
+        # spawn, not fork: a worker must not inherit the dispatcher's threads and open files
+        self._ctx = multiprocessing.get_context("spawn")
+        # One reader per pipe, so no cross-process lock a dying worker could leave held;
+        # a restarted worker gets the same pipe and picks up what is still in it
+        self.pipes = [self._ctx.Pipe(duplex=False) for _ in range(shards)]
+        self.pending = [queue.Queue(queue_size) for _ in range(shards)]
+        self.processes: List = [None] * shards
+        self.routed = [0] * shards
+        self.dropped = [0] * shards
+        self.restarts = [0] * shards
+        self._senders: List[threading.Thread] = []
+        self._started_at = [0.0] * shards
+        self._backoff = [1.0] * shards
+        self._restart_at: List[Optional[float]] = [None] * shards
+
+    def start(self):
+        for shard in range(self.shards):
+            self._spawn(shard)
+            sender = threading.Thread(
+                target=self._send, args=(shard,), name=f"bot-shard-{shard + 1}", daemon=True
+            )
+            sender.start()
+            self._senders.append(sender)
+
+    def _spawn(self, shard: int):
+        # The child re-imports main.py before the target runs, so the role goes in the environment
+        saved = {key: os.environ.get(key) for key in ("BOT_SHARD", "BOT_WORKERS")}
+        os.environ["BOT_SHARD"] = str(shard)
+        os.environ["BOT_WORKERS"] = str(self.shards)
+        try:
+            process = self._ctx.Process(
+                target=self.target,
+                args=(shard, self.shards, self.pipes[shard][0]),
+                name=f"bot-worker-{shard + 1}of{self.shards}",
+            )
+            process.start()
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+        self.processes[shard] = process
+        self._started_at[shard] = time.monotonic()
+        self._restart_at[shard] = None
+        log.info(f"🧩 Worker {shard + 1}/{self.shards} started (pid {process.pid})")
+
+    def _send(self, shard: int):
+        """Move routed updates into the worker's pipe (blocks here, not in route(), while it is behind)"""
+        writer = self.pipes[shard][1]
+        while True:
+            update = self.pending[shard].get()
+            try:
+                writer.send(update)
+            except OSError as e:
+                log.error(f"❌ Worker {shard + 1}/{self.shards} pipe failed: {e}")
+                return
+            if update is None:
+                return
+
+    def route(self, update: Dict, user_id: Optional[int]) -> int:
+        """Queue a raw update for its user's worker; returns the shard (-1 if dropped)"""
+        shard = shard_for(user_id, self.shards)
+        try:
+            self.pending[shard].put_nowait(update)
+        except queue.Full:
+            self.dropped[shard] += 1
+            return -1
+        self.routed[shard] += 1
+        return shard
+
+    def check(self) -> List[int]:
+        """Supervise: restart dead workers, backing off if one keeps dying"""
+        now = time.monotonic()
+        restarted = []
+        for shard, process in enumerate(self.processes):
+            if process is not None and process.is_alive():
+                if now - self._started_at[shard] > 60:
+                    self._backoff[shard] = 1.0
+                continue
+            if self._restart_at[shard] is None:
+                code = process.exitcode if process is not None else None
+                log.warning(
+                    f"⚠️ Worker {shard + 1}/{self.shards} exited (code {code}), "
+                    f"restarting in {self._backoff[shard]:.0f}s"
+                )
+                self._restart_at[shard] = now + self._backoff[shard]
+                self._backoff[shard] = min(self._backoff[shard] * 2, self.max_backoff)
+            elif now >= self._restart_at[shard]:
+                self.restarts[shard] += 1
+                self._spawn(shard)
+                restarted.append(shard)
+        return restarted
+
+    def alive(self) -> int:
+        return sum(1 for process in self.processes if process is not None and process.is_alive())
+
+    def queue_depths(self) -> List[int]:
+        """Updates not yet handed to each worker's pipe"""
+        return [pending.qsize() for pending in self.pending]
+
+    def stop(self, timeout: float = 30.0):
+        """Ask every worker to finish what it was sent and flush, then wait for it"""
+        for pending in self.pending:
+            try:
+                pending.put(None, timeout=1)
+            except queue.Full:
+                pass
+        deadline = time.monotonic() + timeout
+        for shard, process in enumerate(self.processes):
+            if process is None:
+                continue
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                log.warning(f"⚠️ Worker {shard + 1}/{self.shards} did not stop in time, terminating")
+                process.terminate()
+                process.join(5)
+        for reader, writer in self.pipes:
+            reader.close()
+            writer.close()
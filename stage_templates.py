@@ -0,0 +1,157 @@
+"""
+🎭 Stage template tables compiled from config/bot.json
+comprehensive_stage_system.stages is compiled into {stage: {intent: templates}}
+at startup. A watcher thread rebuilds the tables when the file's mtime changes
+and swaps them in atomically, so persona edits go live without a restart.
+Extra intent keywords ("intent_keywords": {intent: [words]}) reload the same way.
+"""
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+# Config template keys -> ResponseEngine intents (other keys keep their own name)
+TEMPLATE_INTENTS = {
+    "greeting": "greeting",
+    "proposal_response": "love",
+    "love_talk": "love",
+    "manipulation": "love",
+    "possessive_explosions": "jealousy",
+}
+
+Table = Dict[int, Dict[str, Tuple[str, ...]]]
+
+# Notes for the persona author inside template text, e.g. "[SYSTEM: TRANSITION TO STAGE 4]";
+# stages follow love points, so these are never meant for the user
+SYSTEM_MARKER = re.compile(r"\s*\[SYSTEM:[^\]]*\]")
+# Replies are sent with parse_mode='Markdown'; these would start (or break) an entity
+MARKDOWN_SPECIAL = re.compile(r"([_*`\[])")
+
+log = logging.getLogger(__name__)
+
+
+class _KeepMissing(dict):
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+def _fill(line: str, context: Mapping) -> str:
+    if "{" not in line:
+        return line
+    try:
+        return line.format_map(context)
+    except (ValueError, IndexError, AttributeError):
+        return line
+
+
+def clean_line(line: str) -> str:
+    """Config template text as it can be sent: system markers dropped, Markdown escaped"""
+    return MARKDOWN_SPECIAL.sub(r"\\\1", SYSTEM_MARKER.sub("", line).strip())
+
+
+def compile_tables(config: Mapping, defaults: Mapping, context: Optional[Mapping] = None) -> Table:
+    """Merge config stage templates over the built-in defaults"""
+    context = _KeepMissing(context or {})
+    table: Table = {stage: {intent: tuple(lines) for intent, lines in intents.items()}
+                    for stage, intents in defaults.items()}
+    stages = config.get("comprehensive_stage_system", {}).get("stages", {})
+    for key, stage_conf in stages.items():
+        match = re.match(r"(\d+)", key)
+        if not match or not isinstance(stage_conf, dict):
+            continue
+        stage = int(match.group(1))
+        collected: Dict[str, list] = {}
+        for section in ("templates", "dialogue_matrix"):
+            for name, value in stage_conf.get(section, {}).items():
+                lines = [value] if isinstance(value, str) else list(value)
+                intent = TEMPLATE_INTENTS.get(name, name)
+                # Static fields like {bot_name} are filled in once, here
+                cleaned = (clean_line(_fill(line, context)) for line in lines if isinstance(line, str) and line)
+                collected.setdefault(intent, []).extend(line for line in cleaned if line)
+        stage_table = table.setdefault(stage, {})
+        for intent, lines in collected.items():
+            if lines:
+                stage_table[intent] = tuple(lines)
+    return table
+
+
+def compile_keywords(config: Mapping) -> Dict[str, Tuple[str, ...]]:
+    """Extra keywords per intent from config; anything malformed is ignored"""
+    extra = config.get("intent_keywords", {})
+    if not isinstance(extra, dict):
+        return {}
+    keywords = {}
+    for intent, words in extra.items():
+        words = [words] if isinstance(words, str) else words
+        if isinstance(words, list):
+            keywords[intent] = tuple(word for word in words if isinstance(word, str) and word)
+    return keywords
+
+
+class StageTemplates:
+    """Per-stage, per-intent template lookup with mtime-based hot reload"""
+
+    def __init__(self, path: str, defaults: Mapping, context: Optional[Mapping] = None,
+                 check_interval: float = 2.0):
+        self.path = path
+        self.defaults = defaults
+        self.context = dict(context or {})
+        self.check_interval = check_interval
+        self.version = 0
+        self.keywords: Dict[str, Tuple[str, ...]] = {}
+        # Bumped only when intent_keywords changes (the intent matcher and its cache follow it)
+        self.keywords_version = 0
+        self._mtime = None
+        self._table: Table = compile_tables({}, defaults, self.context)
+        self._thread = None
+        self._stopped = threading.Event()
+        self.reload()
+
+    def get(self, stage: int, intent: str, fallback: Sequence[str] = ()) -> Sequence[str]:
+        table = self._table
+        stage_table = table.get(stage) or table.get(1, {})
+        return stage_table.get(intent) or fallback
+
+    def reload(self, force: bool = False) -> bool:
+        """Rebuild the tables if the file changed; keeps the old ones on error"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        if not force and mtime == self._mtime:
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            table = compile_tables(config, self.defaults, self.context)
+            keywords = compile_keywords(config)
+        except Exception as e:
+            log.warning(f"⚠️ Template reload failed, keeping previous tables: {e}")
+            self._mtime = mtime
+            return False
+        # Single reference swap: readers see the old or the new table, never a mix
+        self._table = table
+        if keywords != self.keywords:
+            self.keywords = keywords
+            self.keywords_version += 1
+        self._mtime = mtime
+        self.version += 1
+        return True
+
+    def start_watcher(self):
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._watch, name="template-watcher", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop_watcher(self):
+        self._stopped.set()
+
+    def _watch(self):
+        while not self._stopped.wait(self.check_interval):
+            if self.reload():
+                log.info(f"🔄 Stage templates reloaded (v{self.version})")
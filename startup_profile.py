@@ -0,0 +1,53 @@
+"""
+⏱️ Startup timing
+With STARTUP_PROFILE=1 the bot logs how long each startup phase took once it
+is ready, and how long after start the first reply went out.
+"""
+import logging
+import time
+from typing import List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+
+class StartupProfile:
+    """Phase marks measured from the moment this object is created"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self._last = self.started
+        # (phase, seconds since start, seconds since previous mark or None for events)
+        self.marks: List[Tuple[str, float, Optional[float]]] = []
+        self.first_reply: Optional[float] = None
+
+    def mark(self, phase: str) -> float:
+        """End of a sequential phase"""
+        now = time.perf_counter()
+        self.marks.append((phase, now - self.started, now - self._last))
+        self._last = now
+        return now - self.started
+
+    def event(self, name: str) -> float:
+        """Something that happened concurrently (e.g. the web server coming up)"""
+        at = time.perf_counter() - self.started
+        self.marks.append((name, at, None))
+        return at
+
+    def reply_sent(self):
+        if self.first_reply is not None:
+            return
+        self.first_reply = time.perf_counter() - self.started
+        if self.enabled:
+            log.info(f"⏱️ First reply sent {self.first_reply * 1000:.0f} ms after start")
+
+    def report(self) -> str:
+        lines = [f"{'phase':<32}{'took':>10}{'at':>10}"]
+        for name, at, took in sorted(self.marks, key=lambda mark: mark[1]):
+            took_text = f"{took * 1000:8.1f}ms" if took is not None else f"{'·':>10}"
+            lines.append(f"{name:<32}{took_text:>10}{at * 1000:8.1f}ms")
+        return "\n".join(lines)
+
+    def log_report(self):
+        if self.enabled:
+            log.info("⏱️ Startup profile\n" + self.report())
@@ -0,0 +1,365 @@
+"""
+🗄️ Storage backends for user memories
+UserMemory talks to a MemoryStore; MEMORY_BACKEND picks the implementation.
+Saves never leave a half-written record behind; MEMORY_DURABILITY picks how
+they reach the disk: "strict" fsyncs every save, "batched" (default) group-commits
+saves through a journal so many users share one fsync. Records are written
+with the MEMORY_CODEC codec (see codec.py); older formats are read as-is.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import codec
+from journal import Journal
+
+DURABILITY_MODES = ("strict", "batched")
+
+
+class CorruptRecordError(ValueError):
+    """A stored record could not be decoded; it is moved aside (or, read-only, left in place), never overwritten"""
+
+    def __init__(self, user_id: int, where: str, error: Exception):
+        super().__init__(f"Corrupt record for user {user_id} (kept in {where}): {error}")
+        self.user_id = user_id
+        self.where = where
+
+
+def fsync_dir(path: str):
+    """Make renames/deletes in a directory durable (no-op where directories can't be opened)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class MemoryStore:
+    """Storage interface: load, save, list, delete, count"""
+
+    def load(self, user_id: int) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def peek(self, user_id: int) -> Optional[Dict]:
+        """load() for scans that must not change the store (e.g. a registry rebuild)"""
+        return self.load(user_id)
+
+    def save(self, user_id: int, data: Dict):
+        raise NotImplementedError
+
+    def save_many(self, items: Iterable[Tuple[int, Dict]]):
+        """Save several users at once (backends may batch this)"""
+        for user_id, data in items:
+            self.save(user_id, data)
+
+    def list_ids(self) -> Iterator[int]:
+        raise NotImplementedError
+
+    def delete(self, user_id: int) -> bool:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        return sum(1 for _ in self.list_ids())
+
+    def close(self):
+        pass
+
+
+class JSONFileStore(MemoryStore):
+    """One file per user (the original layout), replaced atomically"""
+
+    def __init__(
+        self,
+        root: str = "memory/users",
+        durability: str = "batched",
+        journal_path: Optional[str] = None,
+        journal_max_bytes: int = 4 * 1024 * 1024,
+        codec_name: str = "json",
+        quarantine: bool = True,
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown MEMORY_DURABILITY: {durability}")
+        self.root = root
+        self.durability = durability
+        self.codec = codec.get_codec(codec_name)
+        # False: a read-only caller, corrupt records raise but stay where they are
+        self.quarantine = quarantine
+        os.makedirs(root, exist_ok=True)
+        # journal_path=None with "batched": a reader only (e.g. the web process), no journal
+        self.journal = None
+        if durability == "batched" and journal_path:
+            self.journal = Journal(journal_path, journal_max_bytes)
+            self.journal.recover(self._apply, self._sync_users)
+
+    def path_for(self, user_id: int) -> str:
+        return os.path.join(self.root, f"{user_id}.json")
+
+    def load(self, user_id: int) -> Optional[Dict]:
+        return self._read(user_id, self.quarantine)
+
+    def peek(self, user_id: int) -> Optional[Dict]:
+        return self._read(user_id, quarantine=False)
+
+    def _read(self, user_id: int, quarantine: bool) -> Optional[Dict]:
+        path = self.path_for(user_id)
+        try:
+            with open(path, "rb") as f:
+                return codec.decode(f.read())
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            if not quarantine:
+                raise CorruptRecordError(user_id, path, e) from e
+            # Written before saves were atomic, or damaged on disk: keep it for recovery
+            corrupt = f"{path}.corrupt-{int(time.time())}"
+            os.replace(path, corrupt)
+            raise CorruptRecordError(user_id, corrupt, e) from e
+
+    def _write(self, user_id: int, data: Dict, sync: bool):
+        """Temp file + rename: readers see the old record or the new one, never a torn one"""
+        path = self.path_for(user_id)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp, "wb") as f:
+                f.write(codec.encode(data, self.codec))
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(temp, path)
+        except BaseException:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            raise
+
+    def _apply(self, record: Dict):
+        """Journal replay"""
+        if record.get("deleted"):
+            try:
+                os.remove(self.path_for(record["user_id"]))
+            except FileNotFoundError:
+                pass
+        else:
+            self._write(record["user_id"], record["data"], sync=False)
+
+    def _sync_users(self, user_ids: Iterable[int]):
+        """Journal checkpoint: make these users' files durable"""
+        for user_id in user_ids:
+            try:
+                fd = os.open(self.path_for(user_id), os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        fsync_dir(self.root)
+
+    def save(self, user_id: int, data: Dict):
+        self.save_many([(user_id, data)])
+
+    def save_many(self, items: Iterable[Tuple[int, Dict]]):
+        items = list(items)
+        if not items:
+            return
+        if self.journal is None:
+            for user_id, data in items:
+                self._write(user_id, data, sync=self.durability == "strict")
+            if self.durability == "strict":
+                fsync_dir(self.root)
+            return
+        with self.journal.commit([{"user_id": user_id, "data": data} for user_id, data in items]):
+            for user_id, data in items:
+                self._write(user_id, data, sync=False)
+        self.journal.maybe_checkpoint(self._sync_users)
+
+    def list_ids(self) -> Iterator[int]:
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.endswith(".json") and name[:-5].lstrip("-").isdigit():
+                    yield int(name[:-5])
+
+    def delete(self, user_id: int) -> bool:
+        if self.journal is not None:
+            # Or a replay would bring the user back
+            with self.journal.commit([{"user_id": user_id, "deleted": True}]):
+                return self._remove(user_id)
+        deleted = self._remove(user_id)
+        if deleted and self.durability == "strict":
+            fsync_dir(self.root)
+        return deleted
+
+    def _remove(self, user_id: int) -> bool:
+        try:
+            os.remove(self.path_for(user_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close(self._sync_users)
+
+
+class SQLiteStore(MemoryStore):
+    """Single-file SQLite store in WAL mode with batched upserts"""
+
+    def __init__(
+        self,
+        path: str = "memory/users.db",
+        durability: str = "batched",
+        codec_name: str = "json",
+        quarantine: bool = True,
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown MEMORY_DURABILITY: {durability}")
+        self.path = path
+        self.codec = codec.get_codec(codec_name)
+        self.quarantine = quarantine
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Shared by the event loop and the flusher thread, guarded by _lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # NORMAL: commits are atomic and fsynced at WAL checkpoints; FULL: fsync every commit
+            self._conn.execute(f"PRAGMA synchronous={'FULL' if durability == 'strict' else 'NORMAL'}")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS users (
+                    user_id INTEGER PRIMARY KEY,
+                    stage INTEGER NOT NULL DEFAULT 1,
+                    love INTEGER NOT NULL DEFAULT 0,
+                    last_active REAL,
+                    data BLOB NOT NULL
+                )"""
+            )
+
+    def _row(self, user_id: int, data: Dict) -> Tuple:
+        return (
+            user_id,
+            data.get("stage", 1),
+            data.get("love", 0),
+            data.get("last_active"),
+            codec.encode(data, self.codec),
+        )
+
+    def load(self, user_id: int) -> Optional[Dict]:
+        return self._read(user_id, self.quarantine)
+
+    def peek(self, user_id: int) -> Optional[Dict]:
+        return self._read(user_id, quarantine=False)
+
+    def _read(self, user_id: int, quarantine: bool) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if not row:
+            return None
+        try:
+            # Rows written before codecs are plain JSON text
+            return codec.decode(row[0])
+        except ValueError as e:
+            if not quarantine:
+                raise CorruptRecordError(user_id, f"{self.path} (table users)", e) from e
+            with self._lock:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS corrupt (user_id INTEGER, moved_at REAL, data BLOB)"
+                )
+                self._conn.execute("BEGIN")
+                self._conn.execute("INSERT INTO corrupt VALUES (?, ?, ?)", (user_id, time.time(), row[0]))
+                self._conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+                self._conn.execute("COMMIT")
+            raise CorruptRecordError(user_id, f"{self.path} (table corrupt)", e) from e
+
+    def save(self, user_id: int, data: Dict):
+        self.save_many([(user_id, data)])
+
+    def save_many(self, items: Iterable[Tuple[int, Dict]]):
+        rows = [self._row(user_id, data) for user_id, data in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    """INSERT INTO users (user_id, stage, love, last_active, data)
+                       VALUES (?, ?, ?, ?, ?)
+                       ON CONFLICT(user_id) DO UPDATE SET
+                           stage = excluded.stage,
+                           love = excluded.love,
+                           last_active = excluded.last_active,
+                           data = excluded.data""",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def list_ids(self) -> Iterator[int]:
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute("SELECT user_id FROM users ORDER BY user_id")]
+        return iter(ids)
+
+    def delete(self, user_id: int) -> bool:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+        return cur.rowcount > 0
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_store(
+    backend: Optional[str] = None,
+    durability: Optional[str] = None,
+    journal_path: Optional[str] = None,
+    codec_name: Optional[str] = None,
+    quarantine: bool = True,
+) -> MemoryStore:
+    """Build the store selected by MEMORY_BACKEND (json | sqlite), writing MEMORY_CODEC (json | binary)
+
+    Only the process that writes the store passes journal_path (its journal is
+    replayed here); readers such as a separate web process leave it out, and
+    pass quarantine=False so a corrupt record is reported, not moved aside.
+    """
+    backend = (backend or os.getenv("MEMORY_BACKEND", "json")).lower()
+    durability = (durability or os.getenv("MEMORY_DURABILITY", "batched")).lower()
+    codec_name = codec_name or os.getenv("MEMORY_CODEC", "json")
+    if backend == "json":
+        return JSONFileStore(
+            os.getenv("MEMORY_JSON_DIR", "memory/users"), durability, journal_path,
+            codec_name=codec_name, quarantine=quarantine,
+        )
+    if backend == "sqlite":
+        return SQLiteStore(os.getenv("MEMORY_SQLITE_PATH", "memory/users.db"), durability, codec_name, quarantine)
+    raise ValueError(f"Unknown MEMORY_BACKEND: {backend}")
+
+
+def replay_journals(paths: Iterable[str], root: Optional[str] = None) -> int:
+    """Replay and remove journals nobody will open again (e.g. left by a crash under another BOT_WORKERS)
+
+    Only safe while no process is writing the store.
+    """
+    root = root or os.getenv("MEMORY_JSON_DIR", "memory/users")
+    replayed = 0
+    for path in paths:
+        if os.path.exists(path) or os.path.exists(path + ".old"):
+            JSONFileStore(root, "batched", path).close()
+            replayed += 1
+    return replayed
@@ -0,0 +1,58 @@
+"""
+⚡ Async storage path
+Blocking MemoryStore calls run on a bounded thread pool so the event loop never
+waits on disk. Work for the same user runs in submission order, and concurrent
+loads of one user share a single read.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+
+class AsyncStorageIO:
+    """Await store loads/saves without blocking the event loop"""
+
+    def __init__(self, store, max_workers: int = 4):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="memory-io")
+        self._tails: Dict[int, asyncio.Task] = {}
+        self._loading: Dict[int, asyncio.Task] = {}
+
+    def submit(self, user_id: int, fn: Callable, *args) -> asyncio.Task:
+        """Run fn(*args) on the pool after any earlier work for this user"""
+        loop = asyncio.get_running_loop()
+        previous = self._tails.get(user_id)
+
+        async def run():
+            if previous is not None:
+                try:
+                    await previous
+                except Exception:
+                    pass
+            return await loop.run_in_executor(self._executor, fn, *args)
+
+        task = loop.create_task(run())
+        self._tails[user_id] = task
+
+        def done(t, user_id=user_id):
+            if self._tails.get(user_id) is t:
+                del self._tails[user_id]
+
+        task.add_done_callback(done)
+        return task
+
+    async def load(self, user_id: int) -> Optional[Dict]:
+        task = self._loading.get(user_id)
+        if task is None:
+            task = self.submit(user_id, self.store.load, user_id)
+            self._loading[user_id] = task
+            task.add_done_callback(lambda t, user_id=user_id: self._loading.pop(user_id, None))
+        return await task
+
+    async def drain(self):
+        """Wait for every queued operation to finish"""
+        if self._tails:
+            await asyncio.gather(*list(self._tails.values()), return_exceptions=True)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
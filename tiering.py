@@ -0,0 +1,213 @@
+"""
+🧊 Cold tier for inactive users
+Hot users live in the RAM cache, warm users in the normal store plus their
+memory/logs history file. Users idle for long enough are packed, record and
+history together, into one zlib-compressed row of memory/cold.db; loading one
+through the store moves them back to warm transparently.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from codec import plain
+from message_log import CLEAR
+from storage import MemoryStore
+
+
+class ColdArchive:
+    """Compressed user packs in a single SQLite file (one row, not two files, per user)"""
+
+    def __init__(self, path: str = "memory/cold.db", level: int = 9):
+        self.path = path
+        self.level = level
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # A pack must be durable before the warm copy is deleted
+            self._conn.execute("PRAGMA synchronous=FULL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS cold (
+                    user_id INTEGER PRIMARY KEY,
+                    archived_at REAL NOT NULL,
+                    pack BLOB NOT NULL
+                )"""
+            )
+
+    def pack(self, data: Dict, messages: List[Dict]) -> bytes:
+        raw = json.dumps(
+            {"data": data, "messages": messages}, ensure_ascii=False, separators=(",", ":"), default=plain
+        )
+        return zlib.compress(raw.encode("utf-8"), self.level)
+
+    @staticmethod
+    def unpack(pack: bytes) -> Tuple[Dict, List[Dict]]:
+        entry = json.loads(zlib.decompress(pack).decode("utf-8"))
+        return entry["data"], entry["messages"]
+
+    def put(self, user_id: int, data: Dict, messages: List[Dict]):
+        pack = self.pack(data, messages)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cold (user_id, archived_at, pack) VALUES (?, ?, ?)",
+                (user_id, time.time(), pack),
+            )
+
+    def load(self, user_id: int) -> Optional[Tuple[Dict, List[Dict]]]:
+        with self._lock:
+            row = self._conn.execute("SELECT pack FROM cold WHERE user_id = ?", (user_id,)).fetchone()
+        return self.unpack(row[0]) if row else None
+
+    def delete(self, user_id: int) -> bool:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM cold WHERE user_id = ?", (user_id,))
+        return cur.rowcount > 0
+
+    def missing(self, user_ids: List[int]) -> List[int]:
+        """The given users that are not archived"""
+        archived = set()
+        with self._lock:
+            for start in range(0, len(user_ids), 500):
+                chunk = user_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                archived.update(
+                    row[0] for row in self._conn.execute(
+                        f"SELECT user_id FROM cold WHERE user_id IN ({placeholders})", chunk
+                    )
+                )
+        return [user_id for user_id in user_ids if user_id not in archived]
+
+    def list_ids(self) -> List[int]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT user_id FROM cold ORDER BY user_id")]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cold").fetchone()[0]
+
+    def size_bytes(self) -> int:
+        return sum(
+            os.path.getsize(path) for path in (self.path, self.path + "-wal") if os.path.exists(path)
+        )
+
+    def absorb(self, path: str) -> int:
+        """Move every pack of another archive file in here (the newer pack wins), then delete that file"""
+        with self._lock:
+            self._conn.execute("ATTACH DATABASE ? AS other", (path,))
+            try:
+                self._conn.execute("BEGIN")
+                cur = self._conn.execute(
+                    """INSERT INTO cold (user_id, archived_at, pack)
+                       SELECT user_id, archived_at, pack FROM other.cold WHERE true
+                       ON CONFLICT(user_id) DO UPDATE SET
+                           archived_at = excluded.archived_at,
+                           pack = excluded.pack
+                       WHERE excluded.archived_at > cold.archived_at"""
+                )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+            finally:
+                self._conn.execute("DETACH DATABASE other")
+        for leftover in (path, path + "-wal", path + "-shm"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        return cur.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class TieredStore(MemoryStore):
+    """The warm store in front of a ColdArchive; the warm copy always wins"""
+
+    def __init__(self, warm: MemoryStore, cold: ColdArchive, message_log=None):
+        self.warm = warm
+        self.cold = cold
+        self.message_log = message_log
+        self.archived = 0
+        self.rehydrated = 0
+
+    def load(self, user_id: int) -> Optional[Dict]:
+        data = self.warm.load(user_id)
+        if data is not None:
+            return data
+        entry = self.cold.load(user_id)
+        if entry is None:
+            return None
+        return self._rehydrate(user_id, *entry)
+
+    def peek(self, user_id: int) -> Optional[Dict]:
+        """The record from whichever tier holds it, without moving a cold user back"""
+        data = self.warm.peek(user_id)
+        if data is not None:
+            return data
+        entry = self.cold.load(user_id)
+        return entry[0] if entry else None
+
+    def _rehydrate(self, user_id: int, data: Dict, messages: List[Dict]) -> Dict:
+        # Warm copy first: a crash in between leaves a stale cold row, never a lost user
+        self.warm.save(user_id, data)
+        if self.message_log is not None:
+            self.message_log.append_many(user_id, [CLEAR, *messages])
+        self.cold.delete(user_id)
+        self.rehydrated += 1
+        return data
+
+    def save(self, user_id: int, data: Dict):
+        self.warm.save(user_id, data)
+
+    def save_many(self, items: Iterable[Tuple[int, Dict]]):
+        self.warm.save_many(items)
+
+    def list_ids(self) -> Iterator[int]:
+        warm = set(self.warm.list_ids())
+        yield from warm
+        for user_id in self.cold.list_ids():
+            if user_id not in warm:
+                yield user_id
+
+    def delete(self, user_id: int) -> bool:
+        deleted = self.warm.delete(user_id)
+        deleted = self.cold.delete(user_id) or deleted
+        if self.message_log is not None:
+            self.message_log.delete(user_id)
+        return deleted
+
+    def warm_only(self, user_ids: List[int]) -> List[int]:
+        """Candidates for archive(): the given users that are not cold already"""
+        return self.cold.missing(user_ids)
+
+    def archive(self, user_id: int) -> bool:
+        """Move a warm user (record + history) to the cold tier; the caller makes sure it is idle"""
+        data = self.warm.load(user_id)
+        if data is None:
+            return False
+        messages = self.message_log.tail(user_id) if self.message_log is not None else []
+        self.cold.put(user_id, data, messages)
+        self.warm.delete(user_id)
+        if self.message_log is not None:
+            self.message_log.delete(user_id)
+        self.archived += 1
+        return True
+
+    def stats(self) -> Dict:
+        return {
+            "cold_users": self.cold.count(),
+            "cold_bytes": self.cold.size_bytes(),
+            "archived": self.archived,
+            "rehydrated": self.rehydrated,
+        }
+
+    def close(self):
+        self.warm.close()
+        self.cold.close()
@@ -0,0 +1,111 @@
+"""
+🗜️ Compact in-memory user record
+The fields every user has live in __slots__ as ints and floats (created is
+kept as seconds, not an ISO string); anything else, or a value that would not
+survive the conversion exactly, stays as-is in a small side dict. It behaves
+like the dict it replaces and to_dict() gives back the same JSON record.
+"""
+import datetime
+from collections.abc import MutableMapping
+from typing import Dict, Optional
+
+INT_FIELDS = ("user_id", "stage", "love", "message_count")
+FIELDS = INT_FIELDS + ("created", "last_active")
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_SECOND = datetime.timedelta(seconds=1)
+
+
+def parse_created(value) -> Optional[float]:
+    """Seconds for a naive ISO timestamp, or None when it would not format back identically"""
+    if type(value) is not str:
+        return None
+    try:
+        moment = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if moment.tzinfo is not None:
+        return None
+    seconds = (moment - _EPOCH) / _SECOND
+    return seconds if format_created(seconds) == value else None
+
+
+def format_created(seconds: float) -> str:
+    return (_EPOCH + datetime.timedelta(seconds=seconds)).isoformat()
+
+
+class UserRecord(MutableMapping):
+    """A user's JSON record, without a dict per user"""
+
+    __slots__ = ("user_id", "stage", "love", "message_count", "created", "last_active", "extra")
+
+    def __init__(self, data: Optional[Dict] = None):
+        # None means "not in the record"
+        self.user_id = self.stage = self.love = self.message_count = None
+        self.created = self.last_active = None
+        self.extra = None
+        if data:
+            for key, value in data.items():
+                self[key] = value
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "UserRecord":
+        return cls(data)
+
+    def to_dict(self) -> Dict:
+        return dict(self.items())
+
+    def _set_field(self, key: str, value) -> bool:
+        if key in INT_FIELDS:
+            if type(value) is not int:
+                return False
+        elif key == "last_active":
+            if type(value) is not float:
+                return False
+        else:
+            value = parse_created(value)
+            if value is None:
+                return False
+        setattr(self, key, value)
+        return True
+
+    def __getitem__(self, key):
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        if key in FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                return format_created(value) if key == "created" else value
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in FIELDS:
+            if self.extra:
+                self.extra.pop(key, None)
+            if self._set_field(key, value):
+                return
+            setattr(self, key, None)
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+
+    def __delitem__(self, key):
+        if self.extra and key in self.extra:
+            del self.extra[key]
+        elif key in FIELDS and getattr(self, key) is not None:
+            setattr(self, key, None)
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for key in FIELDS:
+            if getattr(self, key) is not None:
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"UserRecord({self.to_dict()!r})"
@@ -0,0 +1,293 @@
+"""
+📇 Index of every stored user for counts and paginated listings
+Updated as UserMemory objects change, so /api/users never touches the store.
+Persisted as a snapshot: after a clean shutdown the next start skips the
+full store scan.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from heapq import merge
+from typing import Callable, Dict, List, Optional, Tuple
+
+from codec import FormatVersionError
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+def store_source(store) -> str:
+    """Which store a snapshot describes (a snapshot of another store is ignored)"""
+    # A tiered store holds the same users as its warm store
+    store = getattr(store, "warm", store)
+    location = getattr(store, "root", None) or getattr(store, "path", "")
+    return f"{type(store).__name__}:{os.path.abspath(location)}"
+
+
+def _matches(user_stage: int, last_active: float, stage, active_since, active_before) -> bool:
+    """The /api/users filters: stage, and last_active in [active_since, active_before)"""
+    if stage is not None and user_stage != stage:
+        return False
+    if active_since is not None and last_active < active_since:
+        return False
+    return active_before is None or last_active < active_before
+
+
+class UserRegistry:
+    """user_id -> (stage, last_active), with per-stage counts and sorted ids"""
+
+    def __init__(self, snapshot_path: str = "memory/registry.json", source: str = ""):
+        self.snapshot_path = snapshot_path
+        self.source = source
+        self._users: Dict[int, Tuple[int, float]] = {}
+        self._ids: List[int] = []
+        self._stages: Dict[int, int] = {}
+        self._changes = 0
+        self._snapshot_mtime = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def clean_marker(self) -> str:
+        # Exists only while the snapshot matches the store (written at clean shutdown)
+        return self.snapshot_path + ".clean"
+
+    def update(self, user_id: int, stage: int, last_active: float) -> Optional[Tuple[int, float]]:
+        """Record a user's state; returns the previous (stage, last_active), None if new"""
+        entry = (stage, last_active)
+        with self._lock:
+            old = self._users.get(user_id)
+            if old == entry:
+                return old
+            if old is None:
+                if not self._ids or user_id > self._ids[-1]:
+                    self._ids.append(user_id)
+                else:
+                    insort(self._ids, user_id)
+            else:
+                self._stages[old[0]] -= 1
+            self._users[user_id] = entry
+            self._stages[stage] = self._stages.get(stage, 0) + 1
+            self._changes += 1
+        return old
+
+    def remove(self, user_id: int) -> Optional[Tuple[int, float]]:
+        """Forget a deleted user; returns their (stage, last_active), None if unknown"""
+        with self._lock:
+            old = self._users.pop(user_id, None)
+            if old is None:
+                return None
+            del self._ids[bisect_left(self._ids, user_id)]
+            self._stages[old[0]] -= 1
+            self._changes += 1
+            return old
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self._users
+
+    def count(
+        self,
+        stage: Optional[int] = None,
+        active_since: Optional[float] = None,
+        active_before: Optional[float] = None,
+    ) -> int:
+        """Users matching the same filters as page()"""
+        if active_since is None and active_before is None:
+            return len(self._users) if stage is None else self._stages.get(stage, 0)
+        with self._lock:
+            return sum(
+                1 for user_stage, last_active in self._users.values()
+                if _matches(user_stage, last_active, stage, active_since, active_before)
+            )
+
+    def stage_counts(self) -> Dict[int, int]:
+        with self._lock:
+            return {stage: count for stage, count in sorted(self._stages.items()) if count}
+
+    def last_active_times(self) -> List[float]:
+        with self._lock:
+            return [last_active for _, last_active in self._users.values()]
+
+    def page(
+        self,
+        cursor: Optional[int] = None,
+        limit: int = 50,
+        stage: Optional[int] = None,
+        active_since: Optional[float] = None,
+        active_before: Optional[float] = None,
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """Users after cursor (by user_id) matching the filters, plus the next cursor"""
+        items = []
+        with self._lock:
+            start = bisect_right(self._ids, cursor) if cursor is not None else 0
+            for index in range(start, len(self._ids)):
+                user_id = self._ids[index]
+                user_stage, last_active = self._users[user_id]
+                if not _matches(user_stage, last_active, stage, active_since, active_before):
+                    continue
+                items.append({"user_id": user_id, "stage": user_stage, "last_active": last_active})
+                if len(items) >= limit:
+                    more = index + 1 < len(self._ids)
+                    return items, (user_id if more else None)
+        return items, None
+
+    def rebuild(self, store, owns: Optional[Callable[[int], bool]] = None) -> int:
+        """Full scan of the store (first start, or after a crash); owns() picks a shard's users"""
+        users = {}
+        for user_id in store.list_ids():
+            if owns is not None and not owns(user_id):
+                continue
+            try:
+                # peek: a scan must not rehydrate cold users
+                data = store.peek(user_id)
+            except (OSError, ValueError, FormatVersionError) as e:
+                log.warning(f"⚠️ Registry skipped user {user_id}: {e}")
+                continue
+            if data:
+                users[user_id] = (data.get("stage", 1), data.get("last_active") or 0)
+        self._replace(users)
+        return len(users)
+
+    def _replace(self, users: Dict[int, Tuple[int, float]]):
+        stages = {}
+        for stage, _ in users.values():
+            stages[stage] = stages.get(stage, 0) + 1
+        with self._lock:
+            self._users = users
+            self._ids = sorted(users)
+            self._stages = stages
+            self._changes = 0
+
+    # ====== SNAPSHOT ======
+    def save_snapshot(self, clean: bool = False):
+        """Atomically write the index; clean=True only once the store is fully flushed"""
+        with self._lock:
+            rows = [[user_id, *self._users[user_id]] for user_id in self._ids]
+            changes = self._changes
+        if not clean and os.path.exists(self.clean_marker):
+            os.remove(self.clean_marker)
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": SNAPSHOT_VERSION,
+                "source": self.source,
+                "saved_at": time.time(),
+                "users": rows,
+            }, f, separators=(",", ":"))
+        os.replace(temp, self.snapshot_path)
+        if clean:
+            open(self.clean_marker, "w").close()
+        with self._lock:
+            self._changes -= changes
+
+    def _read_snapshot(self) -> bool:
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("source") != self.source:
+            return False
+        self._replace({row[0]: (row[1], row[2]) for row in snapshot.get("users", [])})
+        return True
+
+    def load_snapshot(self) -> bool:
+        """Take over the snapshot if the last shutdown was clean"""
+        if not os.path.exists(self.clean_marker) or not self._read_snapshot():
+            return False
+        # From here on the store moves ahead of the snapshot until the next clean save
+        os.remove(self.clean_marker)
+        return True
+
+    def refresh(self) -> bool:
+        """Read-only view (another process owns the registry): reload when the snapshot changes"""
+        try:
+            mtime = os.stat(self.snapshot_path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._snapshot_mtime:
+            return True
+        loaded = self._read_snapshot()
+        if loaded:
+            self._snapshot_mtime = mtime
+        return loaded
+
+    def start(self, interval: float = 60.0):
+        """Save a (not clean) snapshot every interval while there are changes"""
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="user-registry", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """Stop the snapshot thread and write the final, clean snapshot"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.save_snapshot(clean=True)
+
+    def _run(self, interval: float):
+        while not self._stopped.is_set():
+            self._wake.wait(interval)
+            if self._stopped.is_set():
+                break
+            if self._changes:
+                try:
+                    self.save_snapshot()
+                except OSError as e:
+                    log.warning(f"⚠️ Registry snapshot failed: {e}")
+
+
+class ShardedRegistryView:
+    """Read-only union of the worker registries' snapshots (for the dispatcher's web API)"""
+
+    def __init__(self, snapshot_paths: List[str], source: str = ""):
+        self.shards = [UserRegistry(path, source) for path in snapshot_paths]
+
+    def refresh(self) -> bool:
+        return all([registry.refresh() for registry in self.shards])
+
+    def count(self, stage=None, active_since=None, active_before=None) -> int:
+        return sum(registry.count(stage, active_since, active_before) for registry in self.shards)
+
+    def stage_counts(self) -> Dict[int, int]:
+        counts = {}
+        for registry in self.shards:
+            for stage, count in registry.stage_counts().items():
+                counts[stage] = counts.get(stage, 0) + count
+        return dict(sorted(counts.items()))
+
+    def page(self, cursor=None, limit: int = 50, stage=None, active_since=None, active_before=None):
+        # Each shard returns its own first `limit` matches, so the merged head is exact
+        pages = [registry.page(cursor, limit, stage, active_since, active_before) for registry in self.shards]
+        items = list(merge(*(users for users, _ in pages), key=lambda user: user["user_id"]))
+        more = len(items) > limit or any(next_cursor is not None for _, next_cursor in pages)
+        items = items[:limit]
+        return items, (items[-1]["user_id"] if more and items else None)
+
+
+def open_registry(
+    store,
+    snapshot_path: str = "memory/registry.json",
+    owns: Optional[Callable[[int], bool]] = None,
+) -> UserRegistry:
+    """Registry from the snapshot when it can be trusted, else from a store scan"""
+    registry = UserRegistry(snapshot_path, store_source(store))
+    if not registry.load_snapshot():
+        started = time.perf_counter()
+        count = registry.rebuild(store, owns)
+        log.info(f"📇 User registry rebuilt from store: {count} users in {time.perf_counter() - started:.2f}s")
+    return registry
@@ -0,0 +1,730 @@
+"""
+🌐 Web application: dashboard, health checks, metrics and the Telegram webhook
+One Flask app for every route. Serve it either
+  - inside the bot process, on the bot's own event loop (main.py, WEB_SERVER=asgi), or
+  - on its own with several workers: gunicorn -c gunicorn.conf.py web:app
+"""
+import asyncio
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from flask import Flask, Response, jsonify, request
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+from metrics import REGISTRY
+
+app = Flask(__name__)
+
+# Read bot configuration
+try:
+    with open("config/bot.json", "r", encoding="utf-8") as f:
+        bot_config = json.load(f)
+    bot_name = bot_config["bot_metadata"]["bot_name"]
+    bot_version = bot_config["bot_metadata"]["version"]
+except:
+    bot_name = "සමාලි"
+    bot_version = "1.1"
+
+# Statistics (requests are served on several threads, so count under a lock)
+start_time = time.time()
+DASHBOARD_HITS = REGISTRY.counter("samali_dashboard_requests_total", "Dashboard page views")
+
+# ====== DASHBOARD ======
+# The page is rendered once; per request only uptime, the hit count and the
+# server time change, and even those are reused for DASHBOARD_TTL seconds.
+DASHBOARD_TTL = float(os.getenv("DASHBOARD_TTL", "5"))
+
+DASHBOARD_CSS = """\
+* {
+    margin: 0;
+    padding: 0;
+    box-sizing: border-box;
+}
+
+body {
+    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    color: white;
+    min-height: 100vh;
+    display: flex;
+    justify-content: center;
+    align-items: center;
+    padding: 20px;
+}
+
+.container {
+    background: rgba(0, 0, 0, 0.85);
+    padding: 40px;
+    border-radius: 20px;
+    box-shadow: 0 20px 60px rgba(0, 0, 0, 0.5);
+    max-width: 900px;
+    width: 100%;
+    backdrop-filter: blur(10px);
+    border: 1px solid rgba(255, 255, 255, 0.1);
+}
+
+.header {
+    text-align: center;
+    margin-bottom: 30px;
+}
+
+.emoji {
+    font-size: 4em;
+    margin-bottom: 10px;
+}
+
+h1 {
+    color: #ff6b8b;
+    font-size: 2.8em;
+    margin-bottom: 10px;
+    text-shadow: 0 2px 10px rgba(255, 107, 139, 0.5);
+}
+
+.subtitle {
+    color: #aaa;
+    font-size: 1.2em;
+    margin-bottom: 30px;
+}
+
+.status-card {
+    background: rgba(255, 255, 255, 0.1);
+    padding: 25px;
+    border-radius: 15px;
+    margin-bottom: 30px;
+    border-left: 5px solid #ff6b8b;
+}
+
+.status-title {
+    display: flex;
+    align-items: center;
+    gap: 10px;
+    margin-bottom: 15px;
+    font-size: 1.4em;
+}
+
+.status-badge {
+    background: #4CAF50;
+    color: white;
+    padding: 5px 15px;
+    border-radius: 20px;
+    font-size: 0.8em;
+    font-weight: bold;
+}
+
+.stats-grid {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+    gap: 20px;
+    margin: 30px 0;
+}
+
+.stat-box {
+    background: rgba(255, 255, 255, 0.08);
+    padding: 20px;
+    border-radius: 10px;
+    text-align: center;
+    transition: transform 0.3s ease;
+}
+
+.stat-box:hover {
+    transform: translateY(-5px);
+    background: rgba(255, 255, 255, 0.12);
+}
+
+.stat-value {
+    font-size: 2em;
+    font-weight: bold;
+    color: #ff6b8b;
+    margin-bottom: 5px;
+}
+
+.stat-label {
+    color: #aaa;
+    font-size: 0.9em;
+}
+
+.info-section {
+    margin-top: 30px;
+    background: rgba(255, 255, 255, 0.05);
+    padding: 25px;
+    border-radius: 15px;
+}
+
+h2 {
+    color: #ff6b8b;
+    margin-bottom: 15px;
+    font-size: 1.6em;
+}
+
+.info-grid {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
+    gap: 20px;
+}
+
+.info-item {
+    margin-bottom: 15px;
+}
+
+.info-label {
+    color: #ff6b8b;
+    font-weight: bold;
+    margin-bottom: 5px;
+}
+
+.warning {
+    background: rgba(255, 107, 139, 0.1);
+    border: 1px solid rgba(255, 107, 139, 0.3);
+    padding: 15px;
+    border-radius: 10px;
+    margin-top: 20px;
+    color: #ffb3c1;
+}
+
+.footer {
+    text-align: center;
+    margin-top: 40px;
+    color: #777;
+    font-size: 0.9em;
+    border-top: 1px solid rgba(255, 255, 255, 0.1);
+    padding-top: 20px;
+}
+
+@media (max-width: 768px) {
+    .container {
+        padding: 20px;
+    }
+
+    h1 {
+        font-size: 2em;
+    }
+
+    .stats-grid {
+        grid-template-columns: 1fr;
+    }
+}
+"""
+
+DASHBOARD_TEMPLATE = """\
+<!DOCTYPE html>
+<html lang="si">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{bot_name} - Yandere Queen Bot</title>
+    <link rel="stylesheet" href="{css_url}">
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <div class="emoji">👑</div>
+            <h1>{bot_name}</h1>
+            <div class="subtitle">Ultimate Yandere Queen Bot v{bot_version}</div>
+        </div>
+
+        <div class="status-card">
+            <div class="status-title">
+                <span>🟢 Bot Status</span>
+                <span class="status-badge">ACTIVE</span>
+            </div>
+            <p>සමාලි යන්ඩෙරේ බොට් සක්‍රීයව ක්‍රියාත්මක වෙමින් පවතී. Telegram හරහා කතාබහ කළ හැකිය.</p>
+        </div>
+
+        <div class="stats-grid">
+            <div class="stat-box">
+                <div class="stat-value">{uptime}</div>
+                <div class="stat-label">Uptime</div>
+            </div>
+            <div class="stat-box">
+                <div class="stat-value">{requests}</div>
+                <div class="stat-label">Total Requests</div>
+            </div>
+            <div class="stat-box">
+                <div class="stat-value">5</div>
+                <div class="stat-label">Relationship Stages</div>
+            </div>
+            <div class="stat-box">
+                <div class="stat-value">සිංහල</div>
+                <div class="stat-label">Language</div>
+            </div>
+        </div>
+
+        <div class="info-section">
+            <h2>🤖 Bot Information</h2>
+            <div class="info-grid">
+                <div class="info-item">
+                    <div class="info-label">Full Name</div>
+                    <div>සමාලි කවිතා</div>
+                </div>
+                <div class="info-item">
+                    <div class="info-label">Age</div>
+                    <div>18 years</div>
+                </div>
+                <div class="info-item">
+                    <div class="info-label">Hometown</div>
+                    <div>ගල්මැටියාව, කන්තලේ</div>
+                </div>
+                <div class="info-item">
+                    <div class="info-label">Personality</div>
+                    <div>Yandere (Obsessive Love)</div>
+                </div>
+                <div class="info-item">
+                    <div class="info-label">Zodiac</div>
+                    <div>වෘෂභ (Taurus)</div>
+                </div>
+                <div class="info-item">
+                    <div class="info-label">Dialect</div>
+                    <div>ගැමි ව්‍යවහාරය</div>
+                </div>
+            </div>
+
+            <div class="warning">
+                ⚠️ <strong>Content Warning:</strong> This bot exhibits yandere (obsessive love) behavior patterns. 
+                Stage 5 contains psychological manipulation themes. This is a fictional AI character.
+            </div>
+        </div>
+
+        <div class="info-section">
+            <h2>🎮 Stage System</h2>
+            <div class="info-grid">
+                <div class="info-item">
+                    <div class="info-label">1. STRANGER</div>
+                    <div>අඩුම අදියර</div>
+                </div>
+                <div class="info-item">
+                    <div class="info-label">2. ACQUAINTANCE</div>
+                    <div>හොඳ හැඟීම</div>
+                </div>
+                <div class="info-item">
+                    <div class="info-label">3. CLOSE FRIEND</div>
+                    <div>මිතුරා</div>
+                </div>
+                <div class="info-item">
+                    <div class="info-label">4. DEEP AFFECTION</div>
+                    <div>ගැඹුරු ආදරය</div>
+                </div>
+                <div class="info-item">
+                    <div class="info-label">5. 🔴 YANDERE QUEEN</div>
+                    <div>සම්පූර්ණ අයිතිය</div>
+                </div>
+            </div>
+        </div>
+
+        <div class="footer">
+            <p>🤖 Telegram Bot | 👑 Yandere Queen Edition | 🧠 Advanced AI System</p>
+            <p>Server Time: {server_time}</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+_DYNAMIC_FIELDS = ("uptime", "requests", "server_time")
+
+class CachedAsset:
+    """A response body compressed once per encoding, with a strong ETag"""
+
+    def __init__(self, body: bytes, content_type: str, created: float = None):
+        self.content_type = content_type
+        self.etag = hashlib.sha1(body).hexdigest()[:16]
+        self.last_modified = int(created or time.time())
+        self.bodies = {"identity": body, "gzip": gzip.compress(body, 6)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(body, quality=5)
+        self.encodings = [name for name in ("br", "gzip") if name in self.bodies] + ["identity"]
+
+    def response(self, cache_control: str) -> Response:
+        """Best encoding for this request, or 304 if the client's copy is current"""
+        encoding = request.accept_encodings.best_match(self.encodings, default="identity")
+        response = Response(self.bodies[encoding], content_type=self.content_type)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = cache_control
+        # One ETag per representation, as the bytes differ per encoding
+        response.set_etag(self.etag if encoding == "identity" else f"{self.etag}-{encoding}")
+        response.last_modified = self.last_modified
+        return response.make_conditional(request)
+
+def _prerender(template: str, **static) -> List[str]:
+    """[static, field, static, field, ..., static] with only dynamic fields left open"""
+    keep = {name: "{" + name + "}" for name in _DYNAMIC_FIELDS}
+    filled = template.format(**static, **keep)
+    return re.split(r"\{(" + "|".join(_DYNAMIC_FIELDS) + r")\}", filled)
+
+def _render(parts: List[str], values: Dict[str, str]) -> str:
+    out = list(parts)
+    out[1::2] = [values[name] for name in parts[1::2]]
+    return "".join(out)
+
+css_asset = CachedAsset(DASHBOARD_CSS.encode(), "text/css; charset=utf-8")
+_page_parts = _prerender(
+    DASHBOARD_TEMPLATE,
+    bot_name=bot_name,
+    bot_version=bot_version,
+    css_url=f"/assets/dashboard.css?v={css_asset.etag}",
+)
+_page_lock = threading.Lock()
+_page_cache: Tuple[float, CachedAsset] = (0.0, None)
+
+def dashboard_page() -> CachedAsset:
+    """The rendered page, re-rendered at most once per DASHBOARD_TTL"""
+    global _page_cache
+    expires, page = _page_cache
+    now = time.time()
+    if page is not None and now < expires:
+        return page
+    with _page_lock:
+        expires, page = _page_cache
+        if page is None or now >= expires:
+            html = _render(_page_parts, {
+                "uptime": format_uptime(now - start_time),
+                "requests": str(int(DASHBOARD_HITS.value())),
+                "server_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            })
+            page = CachedAsset(html.encode(), "text/html; charset=utf-8", now)
+            _page_cache = (now + DASHBOARD_TTL, page)
+        return page
+
+@app.route('/')
+def home():
+    DASHBOARD_HITS.inc()
+    return dashboard_page().response(f"public, max-age={int(DASHBOARD_TTL)}")
+
+@app.route('/assets/dashboard.css')
+def dashboard_css():
+    # The URL carries the content hash, so browsers may keep it for a year
+    return css_asset.response("public, max-age=31536000, immutable")
+
+def health_payload() -> Dict:
+    return {
+        "status": "healthy",
+        "service": bot_name,
+        "version": bot_version,
+        "uptime": time.time() - start_time,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.route('/health')
+def health():
+    """Health check endpoint"""
+    return jsonify(health_payload())
+
+@app.route('/status')
+def status():
+    """Detailed status"""
+    registry = _registry()
+    return jsonify({
+        "bot": {
+            "name": bot_name,
+            "version": bot_version,
+            "status": "running"
+        },
+        "server": {
+            "uptime": time.time() - start_time,
+            "requests": int(DASHBOARD_HITS.value()),
+            "timestamp": datetime.now().isoformat()
+        },
+        "features": {
+            "stages": 5,
+            "language": "Sinhala",
+            "memory": os.getenv("MEMORY_BACKEND", "json"),
+            "authentication": "Password-protected"
+        },
+        # Kept up to date as users change; nothing here reads user files
+        "users": {
+            "total": registry.count(),
+            "by_stage": registry.stage_counts(),
+        },
+        "analytics": _analytics().summary(),
+    })
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/ping')
+def ping():
+    """Simple ping endpoint"""
+    return "pong"
+
+# ====== USERS API ======
+# main.py attaches its live registry; a standalone web process (gunicorn) follows
+# the snapshot that the bot process writes
+user_registry = None
+_registry_live = False
+_registry_lock = threading.Lock()
+
+def attach_registry(registry, live: bool = True):
+    """live=False: a snapshot-backed view, refreshed on each request"""
+    global user_registry, _registry_live
+    user_registry, _registry_live = registry, live
+
+def _registry():
+    global user_registry
+    if _registry_live:
+        return user_registry
+    with _registry_lock:
+        if user_registry is None:
+            from storage import open_store
+            from user_registry import UserRegistry, store_source
+
+            # Read-only: a corrupt record is skipped, the bot process deals with it
+            store = open_store(quarantine=False)
+            registry = UserRegistry(os.getenv("USER_REGISTRY_PATH", "memory/registry.json"), store_source(store))
+            if not registry.refresh():
+                registry.rebuild(store)
+            store.close()
+            user_registry = registry
+        else:
+            user_registry.refresh()
+    return user_registry
+
+# ====== ANALYTICS ======
+# Same arrangement as the registry: live counters from main.py, or the snapshots
+bot_analytics = None
+_analytics_live = False
+
+def attach_analytics(analytics, live: bool = True):
+    global bot_analytics, _analytics_live
+    bot_analytics, _analytics_live = analytics, live
+
+def _analytics():
+    global bot_analytics
+    if _analytics_live:
+        return bot_analytics
+    with _registry_lock:
+        if bot_analytics is None:
+            from analytics import AnalyticsView
+
+            bot_analytics = AnalyticsView([os.getenv("ANALYTICS_PATH", "memory/analytics.json")])
+        bot_analytics.refresh()
+    return bot_analytics
+
+def _int_arg(name: str, default=None, minimum=None, maximum=None):
+    value = request.args.get(name)
+    if value in (None, ""):
+        return default
+    number = int(value)
+    if minimum is not None and number < minimum:
+        raise ValueError(f"{name} must be >= {minimum}")
+    if maximum is not None:
+        number = min(number, maximum)
+    return number
+
+def _float_arg(name: str):
+    value = request.args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a unix timestamp") from None
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be a unix timestamp")
+    return number
+
+@app.route('/api/users/count')
+def user_count():
+    """User count from the registry (no directory scan)"""
+    registry = _registry()
+    users, _ = registry.page(limit=10)
+    return jsonify({
+        "count": registry.count(),
+        "by_stage": registry.stage_counts(),
+        "users": [user["user_id"] for user in users]  # First 10 ids
+    })
+
+@app.route('/api/users')
+def list_users():
+    """Users ordered by id: ?cursor=&limit=&stage=&active_since=&active_before="""
+    try:
+        cursor = _int_arg("cursor")
+        limit = _int_arg("limit", 50, minimum=1, maximum=500)
+        stage = _int_arg("stage")
+        active_since = _float_arg("active_since")
+        active_before = _float_arg("active_before")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    registry = _registry()
+    users, next_cursor = registry.page(cursor, limit, stage, active_since, active_before)
+    return jsonify({
+        "users": users,
+        "next_cursor": next_cursor,
+        "total": registry.count(stage, active_since, active_before),
+    })
+
+def format_uptime(seconds):
+    """Format uptime to human readable format"""
+    days = int(seconds // 86400)
+    hours = int((seconds % 86400) // 3600)
+    minutes = int((seconds % 3600) // 60)
+    seconds = int(seconds % 60)
+    
+    if days > 0:
+        return f"{days}d {hours}h"
+    elif hours > 0:
+        return f"{hours}h {minutes}m"
+    elif minutes > 0:
+        return f"{minutes}m {seconds}s"
+    else:
+        return f"{seconds}s"
+
+# ====== SERVING ======
+# Answered on the event loop itself: uptime pingers never wait for a worker thread
+FAST_ROUTES: Dict[str, Callable[[], Tuple[int, str, bytes]]] = {
+    "/ping": lambda: (200, "text/html; charset=utf-8", b"pong"),
+    "/health": lambda: (200, "application/json", json.dumps(health_payload()).encode()),
+}
+
+class ASGIBridge:
+    """Runs the Flask app under an ASGI server
+
+    Views run on a small thread pool so a slow page never blocks the event
+    loop; FAST_ROUTES skip the pool entirely.
+    """
+
+    def __init__(self, wsgi_app, threads: int = 4):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max(1, threads), thread_name_prefix="web")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        fast = FAST_ROUTES.get(scope["path"])
+        if fast is not None and scope["method"] in ("GET", "HEAD"):
+            status, content_type, body = fast()
+            headers = [(b"content-type", content_type.encode("latin-1"))]
+            await self._respond(send, status, headers, [body])
+            return
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        environ = self._environ(scope, bytes(body))
+        loop = asyncio.get_running_loop()
+        status, headers, chunks = await loop.run_in_executor(self.executor, self._call_wsgi, environ)
+        await self._respond(send, status, headers, chunks)
+
+    def _call_wsgi(self, environ) -> Tuple[int, List, List[bytes]]:
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = [
+                (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers
+            ]
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            chunks = [chunk for chunk in result if chunk]
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return started["status"], started["headers"], chunks
+
+    @staticmethod
+    async def _respond(send, status: int, headers: List, chunks: List[bytes]):
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": b"".join(chunks)})
+
+    @staticmethod
+    def _environ(scope, body: bytes) -> Dict:
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "REMOTE_ADDR": client[0],
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in scope.get("headers", []):
+            name, value = name.decode("latin-1"), value.decode("latin-1")
+            if name == "content-type":
+                key = "CONTENT_TYPE"
+            elif name == "content-length":
+                key = "CONTENT_LENGTH"
+            else:
+                key = "HTTP_" + name.upper().replace("-", "_")
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+def make_server(host: str, port: int, threads: int = 4, keepalive: float = 5, max_connections: int = 0):
+    """uvicorn server for app; run it with `await server.serve()` on the bot's loop"""
+    import uvicorn
+
+    class _Server(uvicorn.Server):
+        def capture_signals(self):
+            # SIGINT/SIGTERM belong to the bot, which stops the server itself
+            return contextlib.nullcontext()
+
+    config = uvicorn.Config(
+        ASGIBridge(app, threads),
+        host=host,
+        port=port,
+        lifespan="off",
+        timeout_keep_alive=keepalive,
+        limit_concurrency=max_connections or None,
+        log_config=None,
+        access_log=False,
+    )
+    return _Server(config)
+
+async def wait_ready(server, task: asyncio.Task, timeout: float = 10.0):
+    """Return once server is accepting connections (raises if it failed to start)"""
+    deadline = time.monotonic() + timeout
+    while not server.started:
+        if task.done():
+            task.result()
+            raise RuntimeError("web server exited during startup")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"web server not ready after {timeout}s")
+        await asyncio.sleep(0.01)
+
+def port_ready(host: str, port: int, timeout: float = 5.0) -> bool:
+    """Poll until something accepts connections on host:port"""
+    if host in ("0.0.0.0", "::", ""):
+        host = "127.0.0.1"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.2).close()
+            return True
+        except OSError:
+            time.sleep(0.02)
+    return False
+
+def run_dev_server(host: str, port: int):
+    """Flask's built-in server, only for when uvicorn is not installed"""
+    app.run(host=host, port=port, debug=False, threaded=True)
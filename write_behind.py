@@ -0,0 +1,122 @@
+"""
+💾 Write-behind persistence for UserMemory
+Mutations mark a user dirty; a background thread saves dirty users in batches.
+"""
+import contextlib
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class WriteBehindFlusher:
+    """Coalesce per-message saves into one write per user per flush window"""
+
+    def __init__(self, store, interval: float = 5.0, batch_size: int = 100, message_log=None, on_flush=None):
+        self.store = store
+        self.message_log = message_log
+        # on_flush(seconds, users) is called after every successful batch
+        self.on_flush = on_flush
+        self.interval = interval
+        self.batch_size = batch_size
+        self._dirty = {}
+        self._lock = threading.Lock()
+        # Held while writing so flush_one() can't return mid-batch
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def mark_dirty(self, memory):
+        """Queue a UserMemory for the next flush"""
+        with self._lock:
+            self._dirty[memory.user_id] = memory
+            pending = len(self._dirty)
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._dirty)
+
+    def is_dirty(self, user_id) -> bool:
+        with self._lock:
+            return user_id in self._dirty
+
+    @contextlib.contextmanager
+    def paused(self):
+        """No flush is writing while this is held (e.g. while a user moves to the cold tier)"""
+        with self._write_lock:
+            yield
+
+    def flush(self) -> int:
+        """Write every dirty user now; returns how many were saved"""
+        with self._write_lock:
+            with self._lock:
+                batch, self._dirty = self._dirty, {}
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            logs = {}
+            if self.message_log is not None:
+                logs = {user_id: memory.take_pending_messages() for user_id, memory in batch.items()}
+            try:
+                self.store.save_many((user_id, memory.to_dict()) for user_id, memory in batch.items())
+                while logs:
+                    user_id, records = next(iter(logs.items()))
+                    if records:
+                        self.message_log.append_many(user_id, records)
+                    del logs[user_id]
+            except Exception as e:
+                log.exception(f"⚠️ Flush of {len(batch)} users failed: {e}")
+                # Newer changes may have re-queued some already; keep those
+                with self._lock:
+                    for user_id, memory in batch.items():
+                        if user_id in logs:
+                            memory.restore_pending_messages(logs[user_id])
+                        self._dirty.setdefault(user_id, memory)
+                return 0
+            if self.on_flush is not None:
+                self.on_flush(time.perf_counter() - started, len(batch))
+            return len(batch)
+
+    def flush_one(self, user_id) -> bool:
+        """Write a single user now if it is dirty (used before cache eviction)"""
+        with self._write_lock:
+            with self._lock:
+                memory = self._dirty.pop(user_id, None)
+            if memory is None:
+                return False
+            try:
+                memory.write()
+            except Exception:
+                with self._lock:
+                    self._dirty.setdefault(user_id, memory)
+                raise
+            return True
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-flusher", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self) -> int:
+        """Stop the background thread and flush whatever is left"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        return self.flush()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            self.flush()